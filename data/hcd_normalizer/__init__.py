@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+HCD2025 LP 用のビルド補助パッケージ。
+
+data/ 直下の normalize_hcd_csvs_v*.py と同じ前提（リポジトリ直下に
+index.html / script.js / style.css、data/ に CSV マスタ、assets/ に画像）で動く。
+
+  cd data && python -m hcd_normalizer normalize  # マスタ CSV の正規化（= normalize_hcd_csvs_v6.py）
+                                                 # 写真列には width / height / placeholder を付与
+  cd data && python -m hcd_normalizer compress   # .gz / .br の事前圧縮
+  cd data && python -m hcd_normalizer serve      # 本番相当のローカルサーバ
+  cd data && python -m hcd_normalizer audit      # assets/ の未参照・参照切れ・サイズ超過
+  cd data && python -m hcd_normalizer critical   # ファーストビュー CSS のインライン化
+  cd data && python -m hcd_normalizer shards     # speakers / voices の要約・詳細シャード（遅延読み込み用）
+  cd data && python -m hcd_normalizer ics        # スケジュールから assets/ に .ics（全体・トラック別・セッション別）
+  cd data && python -m hcd_normalizer build      # 上記をまとめて依存順・並列・差分で実行（→ dist/）
+  cd data && python -m hcd_normalizer roster F   # 大きな名簿の重複排除とセッション別集計
+
+依存は data/requirements-build.txt（pip install -r data/requirements-build.txt）:
+  Pillow  写真プレースホルダをぼかし JPEG にする。build は必須、normalize 単体では
+          無ければ警告して単色グレーの SVG にする
+  brotli  任意。compress で .br も作る（無ければ .gz のみ）
+
+import 時にはファイルを読まない。各サブモジュールも使われるまで読み込まない。
+"""
+import os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CACHE_DIR_NAME = ".hcd_cache"
+
+# 名前 → 定義しているサブモジュール（PEP 562 の遅延 import）
+_LAZY = {
+    "normalize": "core",
+    "NormalizeOptions": "core",
+    "NormalizeResult": "core",
+    "TABLES": "core",
+}
+
+__all__ = ["ROOT", "cache_dir"] + list(_LAZY)
+
+
+def cache_dir(root=None):
+    """ビルドキャッシュ置き場（.gitignore 済み）"""
+    path = os.path.join(root or ROOT, CACHE_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def tmp_path(path):
+    """path の横に置く一時ファイル名（プロセス・スレッドごとに別名）"""
+    import threading
+    return "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+
+
+def write_atomic(path, data):
+    """一時ファイル経由で置き換える（並列に書いても混ざらず、ハードリンク先も書き換えない）"""
+    tmp = tmp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def __getattr__(name):
+    mod = _LAZY.get(name)
+    if mod is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    import importlib
+    value = getattr(importlib.import_module("." + mod, __name__), name)
+    globals()[name] = value
+    return value
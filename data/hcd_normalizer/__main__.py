@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""python -m hcd_normalizer <command> [...]"""
+import sys
+
+COMMANDS = {
+    "normalize": "hcd_normalizer.core",
+    "compress": "hcd_normalizer.compress",
+    "serve": "hcd_normalizer.serve",
+    "audit": "hcd_normalizer.audit",
+    "critical": "hcd_normalizer.critical_css",
+    "build": "hcd_normalizer.build",
+    "roster": "hcd_normalizer.roster",
+    "shards": "hcd_normalizer.shards",
+    "ics": "hcd_normalizer.ics",
+}
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in COMMANDS:
+        print("usage: python -m hcd_normalizer {%s} [...]" % ",".join(COMMANDS), file=sys.stderr)
+        return 2
+    import importlib
+    mod = importlib.import_module(COMMANDS[argv[0]])
+    return mod.main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+assets/ の到達可能性チェックと、参照されているものだけを含む公開ディレクトリの作成。
+
+参照元:
+- HCD2025_assets_full.csv の url、speakers / voices マスタの photo_file（normalize と同じ解決規則）
+- index.html / style.css / script.js / LP テキストマスタ中の ./assets/xxx.ext
+
+  python -m hcd_normalizer audit                    # レポートのみ
+  python -m hcd_normalizer audit --budget 150000    # 150KB 超を oversize として挙げる
+  python -m hcd_normalizer audit --publish ../dist  # 到達可能な assets だけのサイトを作る
+"""
+import argparse, os, re, shutil, sys
+from urllib.parse import unquote
+
+from . import ROOT
+
+SITE_FILES = ("index.html", "style.css", "script.js", "robots.txt")
+TEXT_REF_SOURCES = ("index.html", "style.css", "script.js", "data/HCD2025_LP_text_master.csv")
+DEFAULT_BUDGET = 200 * 1024
+ASSET_REF_RE = re.compile(r"""(?:\./)?assets/([A-Za-z0-9_.%\-]+\.[A-Za-z0-9]+)""")
+
+
+def scan_assets(assets_dir):
+    """assets/ を 1 回だけ走査して {ファイル名: バイト数} を返す（compress のサイドカーは除く）"""
+    out = {}
+    try:
+        with os.scandir(assets_dir) as it:
+            for e in it:
+                if e.is_file() and not e.name.endswith((".gz", ".br")):
+                    out[e.name] = e.stat().st_size
+    except OSError:
+        pass
+    return out
+
+
+def collect_references(root=None):
+    """{assets/ 内のファイル名: [参照元, ...]} を返す"""
+    from .core import NormalizeOptions, normalize
+    root = root or ROOT
+    refs = {}
+
+    def add(name, origin):
+        if name:
+            refs.setdefault(name, [])
+            if origin not in refs[name]:
+                refs[name].append(origin)
+
+    res = normalize(root, ["assets", "speakers", "voices"], NormalizeOptions(write=False, image_meta=False))
+    for name, col in (("assets", "url"), ("speakers", "photo_url"), ("voices", "photo_url")):
+        table = res[name]
+        origin = os.path.relpath(table.src, root).replace(os.sep, "/")
+        for r in table.rows:
+            url = r.get(col, "")
+            if url.startswith("./assets/"):
+                add(unquote(url[len("./assets/"):]), origin)
+
+    # ics が生成したトラック別・セッション別のフィードは索引から辿れる
+    from .ics import INDEX_NAME, feed_names
+    for name in feed_names(os.path.join(root, "assets", INDEX_NAME)):
+        add(name, "assets/" + INDEX_NAME)
+
+    for rel in TEXT_REF_SOURCES:
+        path = os.path.join(root, rel)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for m in ASSET_REF_RE.finditer(f.read()):
+                add(unquote(m.group(1)), rel)
+    return refs
+
+
+def audit(root=None, budget=DEFAULT_BUDGET):
+    root = root or ROOT
+    files = scan_assets(os.path.join(root, "assets"))
+    refs = collect_references(root)
+    reachable = sorted(n for n in files if n in refs)
+    return {
+        "files": files,
+        "refs": refs,
+        "reachable": reachable,
+        "orphans": sorted(n for n in files if n not in refs),
+        "missing": sorted(n for n in refs if n not in files),
+        "oversize": sorted((n for n in reachable if files[n] > budget), key=lambda n: -files[n]),
+        "budget": budget,
+    }
+
+
+def format_report(rep):
+    files = rep["files"]
+    total = sum(files.values())
+    reach = sum(files[n] for n in rep["reachable"])
+    lines = ["assets: %d files, %d bytes / reachable %d files, %d bytes" % (
+        len(files), total, len(rep["reachable"]), reach)]
+    lines.append("orphans (%d, %d bytes):" % (len(rep["orphans"]), sum(files[n] for n in rep["orphans"])))
+    lines += ["  %-36s %9d" % (n, files[n]) for n in rep["orphans"]]
+    lines.append("missing (%d):" % len(rep["missing"]))
+    lines += ["  %-36s <- %s" % (n, ", ".join(rep["refs"][n])) for n in rep["missing"]]
+    lines.append("oversize > %d bytes (%d):" % (rep["budget"], len(rep["oversize"])))
+    lines += ["  %-36s %9d" % (n, files[n]) for n in rep["oversize"]]
+    return "\n".join(lines)
+
+
+def _link_or_copy(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def publish(rep, out_dir, root=None, sidecars=True):
+    """
+    サイト本体・data/*.csv・到達可能な assets（と .gz / .br）だけを out_dir に並べる。
+    同一ファイルシステムならハードリンク。戻り値は (ファイル数, バイト数)。
+    sidecars=False なら .gz / .br は持ち込まない（build のように後段で out_dir を圧縮し直す場合。
+    リポジトリ直下のサイドカーをリンクすると、後段で書き換えた原本と食い違ったまま残る）。
+    """
+    root = root or ROOT
+    out_dir = os.path.abspath(out_dir)
+    rel_out = os.path.relpath(out_dir, root)
+    if rel_out == "." or rel_out.split(os.sep)[0] in ("assets", "data"):
+        raise ValueError("publish 先にリポジトリ直下・assets/・data/ は指定できません: %s" % out_dir)
+    rels = [n for n in SITE_FILES if os.path.isfile(os.path.join(root, n))]
+    with os.scandir(os.path.join(root, "data")) as it:
+        rels += ["data/" + e.name for e in it if e.is_file() and e.name.endswith(".csv")]
+    rels += ["assets/" + n for n in rep["reachable"]]
+
+    # 前回の publish に残っている不要ファイルは消す
+    if os.path.isdir(os.path.join(out_dir, "assets")):
+        keep = set(rels)
+        with os.scandir(os.path.join(out_dir, "assets")) as it:
+            for e in it:
+                base = re.sub(r"\.(gz|br)$", "", e.name)
+                if "assets/" + base not in keep:
+                    os.remove(e.path)
+
+    count = size = 0
+    for rel in rels:
+        for suffix in ("", ".gz", ".br") if sidecars else ("",):
+            src = os.path.join(root, rel + suffix)
+            if suffix and not os.path.isfile(src):
+                continue
+            _link_or_copy(src, os.path.join(out_dir, rel + suffix))
+            count += 1
+            size += os.path.getsize(src)
+    return count, size
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="assets/ の未参照・参照切れ・サイズ超過を調べる")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="1 ファイルのサイズ上限（bytes）")
+    ap.add_argument("--publish", metavar="DIR", help="到達可能な assets だけを含む公開ディレクトリを作る")
+    ap.add_argument("--strict", action="store_true", help="参照切れがあれば終了コード 1")
+    args = ap.parse_args(argv)
+
+    rep = audit(args.root, args.budget)
+    print(format_report(rep))
+    if args.publish:
+        count, size = publish(rep, args.publish, args.root)
+        print("published: %d files, %d bytes -> %s" % (count, size, args.publish))
+    return 1 if (args.strict and rep["missing"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
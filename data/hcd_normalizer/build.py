@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入力・出力を宣言したステージを依存グラフとして並列に実行するビルド。
+
+  python -m hcd_normalizer build               # 全部（変更のないステージはスキップ）
+  python -m hcd_normalizer build --force -j 4
+  python -m hcd_normalizer build --only normalize:speakers
+
+- 依存関係は「あるステージの入力が別のステージの出力に含まれるか」と after で決まる
+- 入力ファイル・ステージの実装ファイル・依存ステージのキーの sha256 からキーを作り、
+  前回と同じで出力も揃っていればスキップ（ハッシュは mtime / size でメモ化）
+- 実行はプロセスプール（既定で CPU 数）。終わったら所要時間とクリティカルパスを表示
+"""
+import argparse, fnmatch, glob, hashlib, importlib.util, json, os, sys, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from . import ROOT, cache_dir, write_atomic
+from .compress import sha256_file
+
+CACHE_NAME = "build.json"
+DIST_DIR = "dist"
+# core.IMAGE_EXT_RE と同じ拡張子。glob は大文字小文字を区別するので両方並べる
+IMAGE_EXTS = ("png", "jpg", "jpeg", "webp", "gif", "svg")
+IMAGE_EXTS += tuple(e.upper() for e in IMAGE_EXTS)
+
+
+class Stage:
+    """
+    inputs / outputs は root 相対のパス（inputs は glob 可、outputs はファイルかディレクトリ）。
+    func(root, *args) はプロセスプールで呼ばれるのでモジュールのトップレベル関数にすること。
+    after は入出力で表せない順序だけの依存。
+    impl は func が実際に使うモジュール名（hcd_normalizer.core など）。これらと func のモジュール、
+    パッケージの __init__ のソースがキーに入るので、実装を直せばそのステージは作り直される。
+    """
+    __slots__ = ("name", "func", "args", "inputs", "outputs", "after", "impl")
+
+    def __init__(self, name, func, args=(), inputs=(), outputs=(), after=(), impl=()):
+        self.name, self.func, self.args = name, func, tuple(args)
+        self.inputs, self.outputs, self.after = tuple(inputs), tuple(outputs), tuple(after)
+        self.impl = tuple(impl)
+
+
+# ---------- ステージの実体（プロセスプールから呼ぶのでトップレベル） ----------
+def _stage_normalize(root, table):
+    from .core import normalize
+    t = normalize(root, [table])[table]
+    return "%d rows%s" % (len(t.rows), "" if t.written else ", unchanged")
+
+
+def _stage_publish(root, dist):
+    from .audit import audit, publish
+    rep = audit(root)
+    # .gz / .br は compress ステージが dist/ の中身から作り直す
+    count, size = publish(rep, os.path.join(root, dist), root, sidecars=False)
+    return "%d files, %d bytes (orphans %d, missing %d)" % (count, size, len(rep["orphans"]), len(rep["missing"]))
+
+
+def _stage_critical(root, dist):
+    from .critical_css import build
+    r = build(root, os.path.join(root, dist, "index.html"))
+    return "inlined %d / not critical %d bytes (style.css still loads async)" % (r["inlined_bytes"], r["deferred_bytes"])
+
+
+def _stage_shards(root, dist):
+    from .shards import build_shards
+    r = build_shards(root, os.path.join(root, dist, "data", "shards"))
+    return "%d files, %d bytes (written %d)" % (r["files"], r["bytes"], len(r["written"]))
+
+
+def _stage_ics(root, dist):
+    from .ics import build_feeds
+    r = build_feeds(root)
+    return "%d sessions, %d feeds (written %d)" % (r["sessions"], r["feeds"], len(r["written"]))
+
+
+def _stage_compress(root, dist):
+    from .compress import precompress
+    res = precompress(os.path.join(root, dist), cache_path=os.path.join(cache_dir(root), "compress-dist.json"))
+    saved = sum(r["size"] - (r.get("gz") or r["size"]) for r in res)
+    return "%d files, gzip saved %d bytes" % (len(res), saved)
+
+
+def _impl(*names):
+    return tuple("hcd_normalizer." + n for n in names)
+
+
+def default_stages(root=None, dist=DIST_DIR):
+    """正規化 → 公開ディレクトリ → クリティカル CSS・データシャード・カレンダー → 事前圧縮"""
+    from .core import TABLES
+    stages = []
+    for name, spec in TABLES.items():
+        inputs = ["data/" + spec.src]
+        if spec.photo_field:
+            inputs += ["assets/*." + ext for ext in IMAGE_EXTS]   # width / height / placeholder 列が写真に依存する
+        impl = _impl("core", "textnorm")
+        if spec.photo_field:
+            # Pillow の版が変わるとぼかしプレースホルダも変わる
+            impl = _impl("core", "textnorm", "images", "compress") + ("PIL._version",)
+        stages.append(Stage("normalize:" + name, _stage_normalize, (name,), inputs, ["data/" + spec.out],
+                            impl=impl))
+    # カレンダーは assets/ に書き、publish がほかの assets と一緒に公開する
+    from .ics import CAL_NAME, INDEX_NAME, LP_TEXT_SRC, OVERVIEW_SRC
+    stages.append(Stage("ics", _stage_ics, (dist,),
+                        ["data/" + TABLES["schedule"].src, "data/" + TABLES["speakers"].src,
+                         OVERVIEW_SRC.replace(os.sep, "/"), LP_TEXT_SRC.replace(os.sep, "/")],
+                        ["assets/%s.ics" % CAL_NAME, "assets/" + INDEX_NAME], impl=_impl("ics", "core", "textnorm")))
+    site = ["index.html", "style.css", "script.js", "robots.txt"]
+    stages.append(Stage("publish", _stage_publish, (dist,), site + ["data/*.csv", "assets/*"], [dist],
+                        impl=_impl("audit", "core", "textnorm")))
+    stages.append(Stage("critical", _stage_critical, (dist,), ["index.html", "style.css"],
+                        [dist + "/index.html"], after=["publish"], impl=_impl("critical_css")))
+    from .shards import SHARD_TABLES
+    stages.append(Stage("shards", _stage_shards, (dist,), ["data/" + TABLES[n].out for n in SHARD_TABLES],
+                        [dist + "/data/shards"], after=["publish"], impl=_impl("shards", "core")))
+    stages.append(Stage("compress", _stage_compress, (dist,),
+                        [dist + "/*.html", dist + "/*.css", dist + "/*.js", dist + "/data/*.csv", dist + "/assets/*.ics",
+                         dist + "/data/shards/*.json"],
+                        [], after=["publish", "critical", "shards"], impl=_impl("compress")))
+    return stages
+
+
+# ---------- グラフ ----------
+def _produces(pattern, output):
+    """入力パターンが出力（ファイル or ディレクトリ）に掛かるか"""
+    if fnmatch.fnmatch(output, pattern) or pattern == output:
+        return True
+    return pattern.startswith(output.rstrip("/") + "/")
+
+
+def build_graph(stages):
+    """{stage名: 依存する stage 名の集合}。循環があれば ValueError"""
+    by_name = {s.name: s for s in stages}
+    deps = {s.name: set() for s in stages}
+    for s in stages:
+        for other in stages:
+            if other is s:
+                continue
+            if any(_produces(p, o) for p in s.inputs for o in other.outputs):
+                deps[s.name].add(other.name)
+        for a in s.after:
+            if a in by_name:
+                deps[s.name].add(a)
+
+    # 循環チェック（トポロジカルソート）
+    order, done, visiting = [], set(), set()
+
+    def visit(n):
+        if n in done:
+            return
+        if n in visiting:
+            raise ValueError("build graph has a cycle at %s" % n)
+        visiting.add(n)
+        for d in sorted(deps[n]):
+            visit(d)
+        visiting.discard(n)
+        done.add(n)
+        order.append(n)
+
+    for n in sorted(deps):
+        visit(n)
+    return deps, order
+
+
+# ---------- ハッシュとキャッシュ ----------
+def _module_file(name):
+    """モジュールを import せずにソースファイルの場所を引く"""
+    mod = sys.modules.get(name)
+    if mod is not None and getattr(mod, "__file__", None):
+        return mod.__file__
+    return importlib.util.find_spec(name).origin
+
+
+class _Hasher:
+    def __init__(self, memo):
+        self.memo = memo      # path → [mtime_ns, size, sha256]
+
+    def file(self, path):
+        st = os.stat(path)
+        prev = self.memo.get(path)
+        if prev and prev[0] == st.st_mtime_ns and prev[1] == st.st_size:
+            return prev[2]
+        self.memo[path] = [st.st_mtime_ns, st.st_size, sha256_file(path)]
+        return self.memo[path][2]
+
+    def stage_key(self, root, stage, dep_keys=()):
+        h = hashlib.sha256()
+        # 依存ステージが作り直されたら（出力が上書きされうるので）こちらも作り直す
+        for k in dep_keys:
+            h.update((k or "").encode("ascii"))
+        h.update(stage.name.encode("utf-8"))
+        h.update(repr(stage.args).encode("utf-8"))
+        # 実装が変わったら作り直す（ラッパーのある build.py だけでなく、実際に動くモジュールも見る）
+        for name in ("hcd_normalizer", stage.func.__module__) + stage.impl:
+            h.update(self.file(_module_file(name)).encode("ascii"))
+        for pattern in stage.inputs:
+            for path in sorted(glob.glob(os.path.join(root, pattern))):
+                if os.path.isfile(path) and not path.endswith((".gz", ".br")):
+                    h.update(os.path.relpath(path, root).encode("utf-8"))
+                    h.update(self.file(path).encode("ascii"))
+        return h.hexdigest()
+
+
+def _run_stage(func, root, args):
+    t0 = time.perf_counter()
+    detail = func(root, *args)
+    return detail, time.perf_counter() - t0
+
+
+def run(stages, root=None, jobs=None, force=False, only=None, use_threads=False, log=print):
+    """
+    ステージを依存順に並列実行し、{name: {status, seconds, start, end, detail}} を返す。
+    status は "ran" / "skipped" / "failed" / "blocked"。
+    """
+    root = root or ROOT
+    deps, order = build_graph(stages)
+    by_name = {s.name: s for s in stages}
+    if only:
+        # 指定ステージとその依存だけ
+        want, stack = set(), list(only)
+        while stack:
+            n = stack.pop()
+            if n not in by_name:
+                raise KeyError("unknown stage: %s" % n)
+            if n not in want:
+                want.add(n)
+                stack.extend(deps[n])
+        order = [n for n in order if n in want]
+
+    cache_path = os.path.join(cache_dir(root), CACHE_NAME)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    hasher = _Hasher(cache.setdefault("files", {}))
+    keys = cache.setdefault("stages", {})
+
+    results = {}
+    pending = list(order)
+    running = {}
+    t_start = time.perf_counter()
+    pool_cls = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with pool_cls(max_workers=jobs or os.cpu_count() or 1) as ex:
+        while pending or running:
+            # 依存が片付いたものを投入（スキップ判定はここで入力が確定してから行う）
+            for n in list(pending):
+                busy = set(pending) | {name for name, _ in running.values()}
+                if any(d in busy for d in deps[n]):
+                    continue
+                pending.remove(n)
+                if any(results.get(d, {}).get("status") in ("failed", "blocked") for d in deps[n]):
+                    results[n] = {"status": "blocked", "seconds": 0.0, "start": 0.0, "end": 0.0, "detail": ""}
+                    continue
+                s = by_name[n]
+                key = hasher.stage_key(root, s, [keys.get(d) for d in sorted(deps[n])])
+                outputs_ok = all(os.path.exists(os.path.join(root, o)) for o in s.outputs)
+                now = time.perf_counter() - t_start
+                if not force and keys.get(n) == key and outputs_ok:
+                    results[n] = {"status": "skipped", "seconds": 0.0, "start": now, "end": now, "detail": ""}
+                    log("  skip  %s" % n)
+                    continue
+                fut = ex.submit(_run_stage, s.func, root, s.args)
+                running[fut] = (n, now)
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                n, started = running.pop(fut)
+                end = time.perf_counter() - t_start
+                try:
+                    detail, secs = fut.result()
+                except Exception as e:
+                    results[n] = {"status": "failed", "seconds": end - started, "start": started, "end": end,
+                                  "detail": "%s: %s" % (type(e).__name__, e)}
+                    keys.pop(n, None)
+                    log("  FAIL  %s: %s" % (n, results[n]["detail"]))
+                    continue
+                results[n] = {"status": "ran", "seconds": secs, "start": started, "end": end, "detail": detail or ""}
+                # 出力が次のステージの入力になるので、キーは実行後の入力で取り直す
+                keys[n] = hasher.stage_key(root, by_name[n], [keys.get(d) for d in sorted(deps[n])])
+                log("  done  %-22s %7.1fms  %s" % (n, secs * 1000, detail or ""))
+
+    write_atomic(cache_path, json.dumps(cache, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return results, deps
+
+
+def critical_path(results, deps):
+    """実測の終了時刻が最も遅いステージから、最後に終わった依存を辿った列"""
+    if not results:
+        return []
+    node = max(results, key=lambda n: results[n]["end"])
+    path = [node]
+    while True:
+        ds = [d for d in deps[node] if d in results]
+        if not ds:
+            break
+        node = max(ds, key=lambda d: results[d]["end"])
+        path.append(node)
+    return path[::-1]
+
+
+def format_report(results, deps):
+    lines = ["%-24s %-8s %9s %9s %9s" % ("stage", "status", "start", "end", "time")]
+    for n, r in sorted(results.items(), key=lambda kv: (kv[1]["start"], kv[0])):
+        lines.append("%-24s %-8s %8.1fms %8.1fms %8.1fms" % (
+            n, r["status"], r["start"] * 1000, r["end"] * 1000, r["seconds"] * 1000))
+    path = critical_path(results, deps)
+    wall = max((r["end"] for r in results.values()), default=0.0)
+    work = sum(r["seconds"] for r in results.values())
+    lines.append("critical path: %s" % " -> ".join(
+        "%s (%.1fms)" % (n, results[n]["seconds"] * 1000) for n in path))
+    lines.append("wall %.1fms / stage time total %.1fms (parallelism x%.2f)" % (
+        wall * 1000, work * 1000, work / wall if wall else 0.0))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ビルドグラフを並列・差分実行する")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--dist", default=DIST_DIR, help="公開ディレクトリ（root 相対）")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="ワーカー数（既定: CPU 数）")
+    ap.add_argument("--force", action="store_true", help="キャッシュを無視して全ステージ実行")
+    ap.add_argument("--only", default=None, help="カンマ区切りのステージ名（依存も実行）")
+    ap.add_argument("--threads", action="store_true", help="プロセスではなくスレッドで実行")
+    ap.add_argument("--list", action="store_true", help="ステージと依存関係を表示して終了")
+    args = ap.parse_args(argv)
+
+    stages = default_stages(args.root, args.dist)
+    from .images import have_pil
+    if not args.list and not have_pil():
+        print("ERROR: build には Pillow が必要です（pip install -r data/requirements-build.txt）", file=sys.stderr)
+        return 2
+    if args.list:
+        deps, order = build_graph(stages)
+        for n in order:
+            print("%-22s <- %s" % (n, ", ".join(sorted(deps[n])) or "-"))
+        return 0
+    only = [s.strip() for s in args.only.split(",") if s.strip()] if args.only else None
+    results, deps = run(stages, args.root, args.jobs, args.force, only, args.threads)
+    print(format_report(results, deps))
+    return 1 if any(r["status"] in ("failed", "blocked") for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+テキスト成果物（HTML/CSS/JS/CSV/ICS など）の横に最大圧縮の .gz / .br を書き出す。
+
+- gzip は level 9・mtime=0 で決定的な出力にする
+- brotli は quality 11（brotli パッケージが無ければ .br はスキップ）
+- 前回から内容ハッシュが変わっていないファイルは再圧縮しない
+- 圧縮後の方が大きい場合はサイドカーを作らない（古いものは消す）。.br を作らない実行でも古い .br は消す
+"""
+import argparse, gzip, hashlib, json, os, sys
+from concurrent.futures import ThreadPoolExecutor
+
+from . import ROOT, cache_dir, write_atomic
+
+TEXT_EXTS = (".html", ".css", ".js", ".csv", ".ics", ".txt", ".json", ".svg", ".xml")
+SITE_FILES = ("index.html", "script.js", "style.css", "robots.txt")
+SCAN_DIRS = ("data", "data/shards", "assets")
+CACHE_NAME = "compress.json"
+
+
+def _load_brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def sha256_file(path, chunk=1 << 16):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(chunk), b""):
+            h.update(b)
+    return h.hexdigest()
+
+
+def collect_targets(root=None, extra=()):
+    """サイトが配信するテキストファイルを列挙（root からの相対パス）"""
+    root = root or ROOT
+    out = []
+    for name in SITE_FILES:
+        if os.path.isfile(os.path.join(root, name)):
+            out.append(name)
+    for d in SCAN_DIRS:
+        base = os.path.join(root, d)
+        if not os.path.isdir(base):
+            continue
+        with os.scandir(base) as it:
+            for e in it:
+                if e.is_file() and e.name.lower().endswith(TEXT_EXTS):
+                    out.append(d + "/" + e.name)
+    for p in extra:
+        rel = os.path.relpath(os.path.abspath(p), root).replace(os.sep, "/")
+        if rel not in out:
+            out.append(rel)
+    return sorted(out)
+
+
+def _write_sidecar(path, payload, orig_size):
+    if len(payload) >= orig_size:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    write_atomic(path, payload)
+    return len(payload)
+
+
+def _stamp(path):
+    """サイドカーの (inode, mtime_ns, size)。無ければ None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def compress_one(root, rel, brotli_mod=None):
+    path = os.path.join(root, rel)
+    with open(path, "rb") as f:
+        raw = f.read()
+    res = {"path": rel, "size": len(raw), "sha256": hashlib.sha256(raw).hexdigest()}
+    res["gz"] = _write_sidecar(path + ".gz", gzip.compress(raw, compresslevel=9, mtime=0), len(raw))
+    if brotli_mod is not None:
+        payload = brotli_mod.compress(raw, mode=brotli_mod.MODE_TEXT, quality=11)
+        res["br"] = _write_sidecar(path + ".br", payload, len(raw))
+    elif os.path.exists(path + ".br"):
+        # brotli 無しで作り直したときに前回の .br が残ると、serve / publish が古い内容を配ってしまう
+        os.remove(path + ".br")
+    for ext in ("gz", "br"):
+        if res.get(ext):
+            res[ext + "_stat"] = _stamp(path + "." + ext)
+    return res
+
+
+def _sidecars_intact(root, rel, prev, want_br):
+    """
+    前回書いたサイドカーがそのまま残っているか。
+    publish のハードリンクや手作業で別のファイルに差し替わっていたら作り直す。
+    """
+    if want_br and "br" not in prev:
+        return False
+    for ext in ("gz", "br"):
+        stamp = _stamp(os.path.join(root, rel) + "." + ext)
+        if prev.get(ext) and (ext == "gz" or want_br):
+            if stamp is None or stamp != prev.get(ext + "_stat"):
+                return False
+        elif stamp is not None:
+            # 書いていないはずのサイドカー（前回は原本より大きかった・brotli 無し）
+            return False
+    return True
+
+
+def _touch_sidecars(root, res):
+    """
+    原本だけ mtime が進んだ（内容は同じ）ときは、サイドカーの mtime を原本に揃える。
+    serve は原本より古いサイドカーを使わないので、揃えないと圧縮版が配信されなくなる。
+    """
+    path = os.path.join(root, res["path"])
+    src = os.stat(path)
+    for ext in ("gz", "br"):
+        stamp = res.get(ext + "_stat")
+        if res.get(ext) and stamp and stamp[1] < src.st_mtime_ns:
+            os.utime(path + "." + ext, ns=(src.st_atime_ns, src.st_mtime_ns))
+            res[ext + "_stat"] = _stamp(path + "." + ext)
+
+
+def precompress(root=None, paths=None, jobs=None, force=False, use_brotli=True, cache_path=None):
+    """
+    paths（root 相対。省略時は collect_targets()）を並列に圧縮し、
+    ファイルごとの結果 dict のリストを返す。skipped=True は前回と同一内容。
+    cache_path を省略すると <root>/.hcd_cache/compress.json を使う。
+    """
+    root = root or ROOT
+    paths = collect_targets(root) if paths is None else list(paths)
+    brotli_mod = _load_brotli() if use_brotli else None
+    want_br = brotli_mod is not None
+
+    cache_path = cache_path or os.path.join(cache_dir(root), CACHE_NAME)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    results, todo = [], []
+    for rel in paths:
+        prev = cache.get(rel)
+        if (not force and prev and _sidecars_intact(root, rel, prev, want_br)
+                and prev.get("sha256") == sha256_file(os.path.join(root, rel))):
+            res = dict(prev, path=rel, skipped=True)
+            _touch_sidecars(root, res)
+            results.append(res)
+        else:
+            todo.append(rel)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as ex:
+        for res in ex.map(lambda rel: compress_one(root, rel, brotli_mod), todo):
+            res["skipped"] = False
+            results.append(res)
+
+    for res in results:
+        cache[res["path"]] = {k: res[k] for k in ("sha256", "size", "gz", "br", "gz_stat", "br_stat") if k in res}
+    write_atomic(cache_path, json.dumps(cache, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8"))
+
+    results.sort(key=lambda r: r["path"])
+    return results
+
+
+def format_report(results):
+    def ratio(n, size):
+        return "%5.1f%%" % (100.0 * n / size) if n and size else "     -"
+
+    lines = ["%-44s %9s %9s %7s %9s %7s" % ("file", "bytes", "gz", "gz%", "br", "br%")]
+    tot = {"size": 0, "gz": 0, "br": 0}
+    for r in results:
+        size, gz, br = r["size"], r.get("gz", 0), r.get("br", 0)
+        mark = " (cached)" if r.get("skipped") else ""
+        lines.append("%-44s %9d %9s %7s %9s %7s%s" % (
+            r["path"], size, gz or "-", ratio(gz, size), br or "-", ratio(br, size), mark))
+        tot["size"] += size
+        # サイドカーが無いファイルは原本がそのまま配信される
+        tot["gz"] += gz or size
+        tot["br"] += br or gz or size
+    total = "total: %d bytes -> gz %d (saved %d)" % (tot["size"], tot["gz"], tot["size"] - tot["gz"])
+    if any("br" in r for r in results):
+        total += " / br %d (saved %d)" % (tot["br"], tot["size"] - tot["br"])
+    lines.append(total)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="静的テキスト成果物の .gz / .br を事前生成する")
+    ap.add_argument("paths", nargs="*", help="追加で圧縮するファイル")
+    ap.add_argument("--root", default=ROOT, help="サイトのルート（既定: リポジトリ直下）")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="並列数（既定: CPU 数）")
+    ap.add_argument("--force", action="store_true", help="ハッシュが同じでも再圧縮する")
+    ap.add_argument("--no-brotli", action="store_true", help=".br を作らない")
+    args = ap.parse_args(argv)
+
+    if not args.no_brotli and _load_brotli() is None:
+        print("WARN: brotli が見つからないため .br は生成しません（pip install brotli）", file=sys.stderr)
+    paths = collect_targets(args.root, args.paths)
+    results = precompress(args.root, paths, jobs=args.jobs, force=args.force,
+                          use_brotli=not args.no_brotli)
+    print(format_report(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+normalize_hcd_csvs_v5c.py の処理をライブラリ化したもの。import しただけでは何も読まない・書かない。
+
+    from hcd_normalizer import normalize
+    res = normalize("/path/to/HCD2025_Tokyo", tables=["speakers"])
+    res["speakers"].rows
+
+モジュール名を関数と同じ normalize にすると、サブモジュールの import（from .normalize import ...）で
+パッケージ属性 hcd_normalizer.normalize がモジュールに上書きされるため core としている。
+
+- assets/ の一覧は解決が必要になった時点で 1 回だけ取る（AssetIndex）
+- 入力 CSV の解析結果は (path, mtime, size) でメモ化し、常駐プロセスから繰り返し呼んでも再解析しない
+- セル文字列の揺れ（全角スペース・ダッシュ・コロン・BOM 等）は textnorm で列ごとに 1 回だけ正規化する
+- 出力は内容が変わったときだけ書き換える（mtime が動かないので後段のキャッシュが効く）
+- 起動を軽くするため dataclasses / typing は使わない（import だけで 20ms 以上かかる）
+"""
+import csv, io, os, re, sys, threading, time
+
+from . import ROOT, write_atomic
+
+VERSION = "v6"
+IMAGE_EXT_RE = re.compile(r"\.(png|jpe?g|webp|gif|svg)$", re.I)
+
+
+# ---------- utils（v5c と同じ挙動） ----------
+def load_text(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return f.read().replace("\r\n", "\n").replace("\r", "\n")
+
+
+def strip_first_label_line(text):
+    lines = [ln for ln in text.split("\n") if ln.strip() != ""]
+    if lines and lines[0].strip().startswith("HCD2025_"):
+        lines = lines[1:]
+    return "\n".join(lines)
+
+
+def sniff_delim(sample_line):
+    return "\t" if ("\t" in sample_line) else ","
+
+
+def read_rows_flex(text, must_keys):
+    """
+    1) 区切り推定
+    2) 全行をreaderで読む
+    3) 上位20行のうち、must_keysのヒット数が最大の行を“本当のヘッダー”と見なす
+    4) その行以降をデータにする
+    """
+    lines = [ln for ln in text.split("\n") if ln.strip() != ""]
+    if not lines: return [], []
+    delim = sniff_delim(lines[0])
+    rdr = csv.reader(io.StringIO("\n".join(lines)), delimiter=delim)
+    rows = [[c.strip() for c in r] for r in rdr if any(x.strip() for x in r)]
+    if not rows: return [], []
+
+    best_i, best_hits = 0, -1
+    for i in range(min(len(rows), 20)):
+        hits = sum(1 for k in must_keys if k in rows[i])
+        if hits > best_hits:
+            best_i, best_hits = i, hits
+
+    header = rows[best_i]
+    data_rows = rows[best_i + 1:]
+    # 途中にヘッダー複写が混ざる場合はスキップ
+    clean = [r for r in data_rows if r != header]
+    return header, clean
+
+
+def rows_to_dicts(header, data_rows):
+    dicts = []
+    for r in data_rows:
+        rec = {}
+        for i, h in enumerate(header):
+            rec[h] = (r[i] if i < len(r) else "").strip()
+        dicts.append(rec)
+    return dicts
+
+
+def ensure_asset_url(s: str) -> str:
+    s = (s or "").strip()
+    if not s: return ""
+    if s.startswith(("http://", "https://", "./assets/")): return s
+    return "./assets/" + s
+
+
+def render_csv(header, rows) -> str:
+    buf = io.StringIO(newline="")
+    w = csv.DictWriter(buf, fieldnames=header)
+    w.writeheader()
+    for r in rows:
+        w.writerow({k: r.get(k, "") for k in header})
+    return buf.getvalue()
+
+
+def write_if_changed(path, text) -> bool:
+    """内容が同じなら書かない。書いたら True（text は str か bytes）"""
+    data = text.encode("utf-8") if isinstance(text, str) else text
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    write_atomic(path, data)
+    return True
+
+
+class AssetIndex:
+    """assets/ のファイル名一覧。最初に参照されたときだけ走査する"""
+
+    SPECIAL = {"hero": "hero_main", "logo": "logo_hcd_2025"}
+
+    def __init__(self, assets_dir):
+        self.assets_dir = assets_dir
+        self._files = None
+
+    @property
+    def files(self):
+        if self._files is None:
+            try:
+                with os.scandir(self.assets_dir) as it:
+                    self._files = sorted(e.name for e in it if e.is_file())
+            except OSError:
+                self._files = []
+        return self._files
+
+    @property
+    def scanned(self) -> bool:
+        return self._files is not None
+
+    def resolve(self, value: str) -> str:
+        """'./assets/hero' のような拡張子なし指定を assets/ 配下の実ファイルに寄せる"""
+        val = (value or "").strip()
+        if not val: return ""
+        base = val[len("./assets/"):] if val.startswith("./assets/") else val
+        base_try = [self.SPECIAL.get(base, base), base]
+        files = self.files
+        if base in files:
+            return "./assets/" + base
+        for b in base_try:
+            for f in files:
+                if f.startswith(b):
+                    return "./assets/" + f
+        for ext in (".jpg", ".png", ".jpeg", ".webp"):
+            cand = base + ext
+            if cand in files:
+                return "./assets/" + cand
+        return "./assets/" + base
+
+
+# ---------- テーブル定義 ----------
+def _row_assets(r, assets):
+    file_key = (r.get("file_key") or r.get("key_for_assets") or r.get("key") or r.get("name") or r.get("category") or "").strip()
+    raw_url  = (r.get("url") or r.get("path") or r.get("src") or r.get("file_name") or "").strip()
+    if file_key in ("file_key", "key_for_assets", "category") and raw_url in ("url", "file_name", "key_for_assets"):
+        return None
+    url = ensure_asset_url(raw_url)
+    if url.startswith("./assets/") and not IMAGE_EXT_RE.search(url):
+        url = assets.resolve(url)
+    if file_key and url:
+        return {"file_key": file_key, "url": url}
+    return None
+
+
+def _row_schedule(r, assets):
+    start = (r.get("timetable1") or r.get("start") or "").strip()
+    end   = (r.get("timetable2") or r.get("end") or "").strip()
+    title = (r.get("session_title_filled") or r.get("session_title") or r.get("title") or "").strip()
+    desc  = (r.get("tags") or r.get("note") or r.get("desc") or "").strip()
+    loc   = (r.get("track") or r.get("location") or "").strip()
+    if any([start, end, title, desc, loc]):
+        return {"start": start, "end": end, "title": title, "desc": desc, "location": loc}
+    return None
+
+
+def _row_speakers(r, assets):
+    id_   = (r.get("order") or r.get("id") or "").strip()
+    name  = (r.get("name_jp") or r.get("name") or r.get("speaker") or "").strip()
+    title = (r.get("title1") or r.get("title") or r.get("affiliation") or "").strip()
+    org   = (r.get("affiliation") or r.get("org") or "").strip()
+    bio   = (r.get("bio_ja") or r.get("bio") or "").strip()
+    photo = (r.get("photo_url") or r.get("photo_file") or r.get("image") or "").strip()
+    if photo and not photo.startswith(("http://", "https://", "./assets/")):
+        photo = "./assets/" + photo
+    if photo.startswith("./assets/") and not IMAGE_EXT_RE.search(photo):
+        photo = assets.resolve(photo)
+    if any([id_, name, title, org, bio, photo]):
+        return {"id": id_, "name": name, "title": title, "org": org, "bio": bio, "photo_url": photo}
+    return None
+
+
+def _row_voices(r, assets):
+    id_   = (r.get("id") or r.get("order") or "").strip()
+    order = (r.get("order") or id_).strip()
+    name  = (r.get("person_name") or r.get("name") or "").strip()
+    line  = (r.get("person_tagline") or r.get("tagline") or "").strip()
+    photo = (r.get("photo_url") or r.get("photo_file") or "").strip()
+    if name in ("person_name", "name") and photo in ("photo_file", "photo_url"):
+        return None
+    if photo and not photo.startswith(("http://", "https://", "./assets/")):
+        photo = "./assets/" + photo
+    if photo.startswith("./assets/") and not IMAGE_EXT_RE.search(photo):
+        photo = assets.resolve(photo)
+    rec = {"id": id_, "order": order, "name": name, "tagline": line, "photo_url": photo,
+           "hcd_title": (r.get("voice_hcd_title") or "").strip(),
+           "hcd_body": (r.get("voice_hcd_body") or "").strip(),
+           "gkai_title": (r.get("voice_gkai_title") or "").strip(),
+           "gkai_body": (r.get("voice_gkai_body") or "").strip()}
+    return rec if any(rec.values()) else None
+
+
+class TableSpec:
+    """
+    1 テーブル分の定義。src / out は data/ 相対、convert(row, assets) は
+    入力の dict 行を出力の dict 行（捨てるなら None）にする。
+    photo_field があるテーブルには images.IMAGE_FIELDS の列が足される。
+    """
+    __slots__ = ("name", "src", "out", "must_keys", "fields", "convert", "photo_field")
+
+    def __init__(self, name, src, out, must_keys, fields, convert, photo_field=None):
+        self.name, self.src, self.out = name, src, out
+        self.must_keys, self.fields, self.convert = tuple(must_keys), tuple(fields), convert
+        self.photo_field = photo_field
+
+
+TABLES = {
+    "assets": TableSpec("assets", "HCD2025_assets_full.csv", "assets_full.csv",
+                        ("file_key", "url", "key_for_assets", "file_name"),
+                        ("file_key", "url"), _row_assets),
+    "schedule": TableSpec("schedule", "HCD2025_schedule_master.csv", "schedule.csv",
+                          ("timetable1", "timetable2", "session_title", "session_title_filled", "track", "tags", "note"),
+                          ("start", "end", "title", "desc", "location"), _row_schedule),
+    "speakers": TableSpec("speakers", "HCD2025_speakers_master.csv", "speakers_master.csv",
+                          ("order", "name_jp", "affiliation", "title1", "bio_ja", "photo_file"),
+                          ("id", "name", "title", "org", "bio", "photo_url"), _row_speakers, "photo_url"),
+    "voices": TableSpec("voices", "HCD2025_voices_master.csv", "voices.csv",
+                        ("id", "order", "person_name", "person_tagline", "photo_file", "voice_hcd_title"),
+                        ("id", "order", "name", "tagline", "photo_url",
+                         "hcd_title", "hcd_body", "gkai_title", "gkai_body"), _row_voices, "photo_url"),
+}
+
+
+class NormalizeOptions:
+    """
+    data_dir / assets_dir: 既定は <event_dir>/data, <event_dir>/assets
+    out_dir: 出力先（既定: data_dir）
+    write: False なら行を返すだけで書き出さない
+    sources: テーブル名 → 入力パスまたは http(s) URL の上書き（URL は fetch で条件付き取得）
+    image_meta: 写真列を持つテーブルに width / height / placeholder を足す
+    text_rules: 入力の列名 → textnorm の規則（None なら textnorm.DEFAULT_COLUMN_RULES、False なら正規化しない）
+    """
+
+    def __init__(self, data_dir=None, assets_dir=None, out_dir=None, write=True, sources=None,
+                 image_meta=True, text_rules=None):
+        self.data_dir = data_dir
+        self.assets_dir = assets_dir
+        self.out_dir = out_dir
+        self.write = write
+        self.sources = dict(sources or {})
+        self.image_meta = image_meta
+        self.text_rules = text_rules
+
+    def text_normalizer(self):
+        if self.text_rules is False:
+            return None
+        from . import textnorm
+        if self.text_rules is None:
+            return textnorm.default_normalizer()
+        return textnorm.TextNormalizer(self.text_rules)
+
+
+class TableResult:
+    """
+    cached は入力が前回と同じで解析を省いたこと、written は出力を書き換えたことを表す。
+    fetch は入力が URL のときの fetch.FetchResult（ローカル入力なら None）。
+    """
+    __slots__ = ("name", "src", "out", "fields", "rows", "written", "cached", "elapsed_ms", "fetch")
+
+    def __init__(self, name, src, out, fields, rows, written=False, cached=False, elapsed_ms=0.0, fetch=None):
+        self.name, self.src, self.out, self.fields, self.rows = name, src, out, fields, rows
+        self.written, self.cached, self.elapsed_ms, self.fetch = written, cached, elapsed_ms, fetch
+
+
+class NormalizeResult:
+    def __init__(self, tables, assets_scanned=False, elapsed_ms=0.0):
+        self.tables = tables
+        self.assets_scanned = assets_scanned
+        self.elapsed_ms = elapsed_ms
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    @property
+    def written(self):
+        return [t.out for t in self.tables.values() if t.written]
+
+
+# (path, mtime_ns, size, must_keys, 正規化規則のキー) → 変換前の dict 行
+# build --threads では normalize・ics・audit が並行して読むのでロックを取る
+_PARSE_CACHE = {}
+_PARSE_LOCK = threading.Lock()
+
+
+def read_table(path, must_keys, text_normalizer=None):
+    """
+    入力 CSV を dict 行にする。ファイルが変わっていなければ前回の結果を返す。
+    text_normalizer（textnorm.TextNormalizer）があれば各セルをここで 1 回だけ正規化する。
+    """
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size, tuple(must_keys),
+           None if text_normalizer is None else text_normalizer.key)
+    with _PARSE_LOCK:
+        hit = _PARSE_CACHE.get(key)
+    if hit is not None:
+        return hit, True
+    txt = strip_first_label_line(load_text(path))
+    hdr, data_rows = read_rows_flex(txt, must_keys=list(must_keys))
+    rows = rows_to_dicts(hdr, data_rows)
+    if text_normalizer is not None:
+        rows = text_normalizer.rows(rows)
+    with _PARSE_LOCK:
+        for k in [k for k in _PARSE_CACHE if k[0] == path]:
+            del _PARSE_CACHE[k]
+        _PARSE_CACHE[key] = rows
+    return rows, False
+
+
+def normalize(event_dir=None, tables=None, options=None):
+    """
+    event_dir（data/ と assets/ を持つディレクトリ）の各マスタを正規化する。
+    tables は TABLES のキーの一部（省略時は全部）。
+    """
+    t0 = time.perf_counter()
+    event_dir = os.path.abspath(event_dir or ROOT)
+    opts = options or NormalizeOptions()
+    data_dir = opts.data_dir or os.path.join(event_dir, "data")
+    out_dir = opts.out_dir or data_dir
+    assets_dir = opts.assets_dir or os.path.join(event_dir, "assets")
+    assets = AssetIndex(assets_dir)
+    image_cache = None
+    text_normalizer = opts.text_normalizer()
+
+    names = list(TABLES) if tables is None else list(tables)
+    unknown = [n for n in names if n not in TABLES]
+    if unknown:
+        raise KeyError("unknown table(s): %s" % ", ".join(unknown))
+
+    # URL 指定のテーブルは先にまとめて（並列・条件付きで）取ってくる
+    remote = {n: opts.sources[n] for n in names if opts.sources.get(n, "").startswith(("http://", "https://"))}
+    fetched = {}
+    if remote:
+        from .fetch import fetch_all
+        fetched = fetch_all(remote, root=event_dir)
+
+    results = {}
+    for name in names:
+        t1 = time.perf_counter()
+        spec = TABLES[name]
+        if name in fetched:
+            src = fetched[name].path
+        else:
+            src = opts.sources.get(name) or os.path.join(data_dir, spec.src)
+        out = os.path.join(out_dir, spec.out)
+        raw, cached = read_table(src, spec.must_keys, text_normalizer)
+        rows = [n for n in (spec.convert(r, assets) for r in raw) if n]
+        fields = spec.fields
+        if opts.image_meta and spec.photo_field:
+            from . import images
+            if image_cache is None:
+                image_cache = images.ImageMetaCache(event_dir)
+            images.annotate_rows(rows, spec.photo_field, assets_dir, image_cache)
+            fields += images.IMAGE_FIELDS
+        written = False
+        if opts.write:
+            written = write_if_changed(out, render_csv(list(fields), rows))
+        results[name] = TableResult(name, src, out, fields, rows, written, cached,
+                                    (time.perf_counter() - t1) * 1000, fetched.get(name))
+
+    if image_cache is not None:
+        image_cache.save()
+    return NormalizeResult(results, assets.scanned, (time.perf_counter() - t0) * 1000)
+
+
+def measure_startup(runs=10):
+    """新しいインタプリタで import + normalize(write=False) するまでの時間（ms）を runs 回測る"""
+    import statistics, subprocess
+    code = ("import time;t=time.perf_counter();from hcd_normalizer import normalize, NormalizeOptions;"
+            "i=time.perf_counter();normalize(options=NormalizeOptions(write=False));"
+            "print((i-t)*1000,(time.perf_counter()-i)*1000)")
+    pkg_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    walls, imports, runs_ms = [], [], []
+    for _ in range(runs):
+        t = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", code], cwd=pkg_parent, check=True,
+                             capture_output=True, text=True).stdout.split()
+        walls.append((time.perf_counter() - t) * 1000)
+        imports.append(float(out[0]))
+        runs_ms.append(float(out[1]))
+    med = statistics.median
+    return {"process_ms": med(walls), "import_ms": med(imports), "normalize_ms": med(runs_ms)}
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="HCD2025 マスタ CSV を LP 用に正規化する")
+    ap.add_argument("--event-dir", default=ROOT, help="data/ と assets/ を含むディレクトリ")
+    ap.add_argument("--tables", default=None, help="カンマ区切り（%s）" % ",".join(TABLES))
+    ap.add_argument("--source", action="append", default=[], metavar="TABLE=PATH_OR_URL",
+                    help="入力の上書き。http(s) URL なら ETag 付きで条件付き取得（複数指定可）")
+    ap.add_argument("--dry-run", action="store_true", help="書き出さずに件数だけ表示")
+    ap.add_argument("--no-image-meta", action="store_true", help="写真のサイズ・プレースホルダ列を付けない")
+    ap.add_argument("--no-textnorm", action="store_true", help="セル文字列の正規化（NFKC・空白・ダッシュ等）をしない")
+    ap.add_argument("--timing", action="store_true", help="テーブルごとの処理時間を表示")
+    ap.add_argument("--startup-bench", type=int, metavar="N", default=0,
+                    help="コールド起動（import + 正規化）を N 回測る")
+    args = ap.parse_args(argv)
+
+    if args.startup_bench:
+        r = measure_startup(args.startup_bench)
+        print("cold start (median of %d): process %.1fms / import %.1fms / normalize %.1fms" % (
+            args.startup_bench, r["process_ms"], r["import_ms"], r["normalize_ms"]))
+        return 0
+
+    sources = {}
+    for item in args.source:
+        name, sep, value = item.partition("=")
+        if not sep or name.strip() not in TABLES:
+            ap.error("--source は TABLE=PATH_OR_URL 形式（TABLE: %s）" % ",".join(TABLES))
+        sources[name.strip()] = value.strip()
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()] if args.tables else None
+    if not args.no_image_meta:
+        from .images import have_pil
+        if not have_pil():
+            print("WARN: Pillow が見つからないため placeholder は単色 SVG になります"
+                  "（pip install -r data/requirements-build.txt）", file=sys.stderr)
+    res = normalize(args.event_dir, tables, NormalizeOptions(write=not args.dry_run, sources=sources,
+                                                                image_meta=not args.no_image_meta,
+                                                                text_rules=False if args.no_textnorm else None))
+    print("OK: normalized(%s)" % VERSION)
+    for t in res.tables.values():
+        line = " %s: %d rows" % (t.name, len(t.rows))
+        if args.timing:
+            line += " (%.2fms%s)" % (t.elapsed_ms, ", cached" if t.cached else "")
+        if t.fetch is not None:
+            line += " [%s %s %.0fms]" % (t.fetch.status or "stale",
+                                         "not modified" if t.fetch.not_modified else "updated", t.fetch.elapsed_ms)
+        if not args.dry_run and not t.written:
+            line += " unchanged"
+        print(line)
+    if args.timing:
+        print(" total: %.2fms" % res.elapsed_ms)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
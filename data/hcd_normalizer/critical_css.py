@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+index.html のファーストビュー（ヘッダー・ヒーロー・お知らせ）に効く style.css のルールだけを
+<head> にインライン化し、style.css 本体は非同期で読み込むように書き換える。
+
+  python -m hcd_normalizer critical                         # 何 bytes インライン化できるかの報告のみ
+  python -m hcd_normalizer critical --out ../dist/index.html
+
+判定は「セレクタ中の各複合セレクタ（タグ・#id・.class）に一致する要素が領域内にあるか」で行う。
+JS で後から付くクラス（.is-open など）や下の方のセクション向けのルールは遅延側に残る。
+遅延側は style.css をそのまま読むので、カスケードの順序は元と変わらない。
+（インライン分も含めて style.css 全体は引き続きダウンロードされる。減るのは描画を止める CSS）
+"""
+import argparse, os, re, sys
+from html.parser import HTMLParser
+
+from . import ROOT, write_atomic
+
+DEFAULT_REGIONS = ("header.global-header", "#hero", "#notice-cost")
+ALWAYS_TAGS = {"html", "body"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+STYLESHEET_LINK_RE = r"""<link\b[^>]*\bhref\s*=\s*["']%s["'][^>]*>"""
+
+
+# ---------- HTML 側: 領域内の要素を集める ----------
+def _parse_simple(sel):
+    """'tag#id.cls1.cls2' → (tag or None, id or None, {classes})"""
+    tag = re.match(r"[A-Za-z][A-Za-z0-9-]*|\*", sel)
+    ids = re.findall(r"#([A-Za-z0-9_-]+)", sel)
+    classes = set(re.findall(r"\.([A-Za-z0-9_-]+)", sel))
+    t = tag.group(0).lower() if tag else None
+    return (None if t == "*" else t), (ids[0] if ids else None), classes
+
+
+class _RegionCollector(HTMLParser):
+    def __init__(self, regions):
+        super().__init__(convert_charrefs=True)
+        self.regions = [_parse_simple(r) for r in regions]
+        self.stack = []            # 各要素が領域の根かどうか
+        self.depth_in_region = 0
+        self.elements = {(t, None, frozenset()) for t in ALWAYS_TAGS}
+
+    def _is_region(self, tag, id_, classes):
+        for rt, rid, rcls in self.regions:
+            if (rt is None or rt == tag) and (rid is None or rid == id_) and rcls <= classes:
+                return True
+        return False
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        id_ = a.get("id")
+        classes = frozenset((a.get("class") or "").split())
+        root = self.depth_in_region == 0 and self._is_region(tag, id_, classes)
+        if self.depth_in_region or root:
+            self.elements.add((tag, id_, classes))
+        if tag in VOID_TAGS:
+            return
+        self.stack.append(root)
+        if root or self.depth_in_region:
+            self.depth_in_region += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS or not self.stack:
+            return
+        self.stack.pop()
+        if self.depth_in_region:
+            self.depth_in_region -= 1
+
+
+def above_fold_elements(html, regions=DEFAULT_REGIONS):
+    p = _RegionCollector(regions)
+    p.feed(html)
+    p.close()
+    return p.elements
+
+
+# ---------- CSS 側: ルールへの分解と選別 ----------
+def _strip_comments(css):
+    return re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+
+
+def parse_css(css):
+    """
+    [("rule", selector, body) | ("at", prelude, children_or_None, body)] のリスト。
+    @media / @supports は children に中身を再帰的に持つ。
+    """
+    css = _strip_comments(css)
+    nodes, i, n = [], 0, len(css)
+    while i < n:
+        j = i
+        quote = None
+        while j < n:
+            c = css[j]
+            if quote:
+                if c == "\\":
+                    j += 1
+                elif c == quote:
+                    quote = None
+            elif c in "\"'":
+                quote = c
+            elif c in "{;":
+                break
+            j += 1
+        prelude = css[i:j].strip()
+        if j >= n:
+            break
+        if css[j] == ";":
+            if prelude.startswith("@"):
+                nodes.append(("at", prelude, None, ""))
+            i = j + 1
+            continue
+        # 対応する閉じ括弧を探す
+        depth, k, quote = 1, j + 1, None
+        while k < n and depth:
+            c = css[k]
+            if quote:
+                if c == "\\":
+                    k += 1
+                elif c == quote:
+                    quote = None
+            elif c in "\"'":
+                quote = c
+            elif c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+            k += 1
+        body = css[j + 1:k - 1]
+        if prelude.startswith("@"):
+            name = prelude.split(None, 1)[0].lower()
+            children = parse_css(body) if name in ("@media", "@supports", "@layer", "@container") else None
+            nodes.append(("at", prelude, children, body))
+        elif prelude:
+            nodes.append(("rule", prelude, body))
+        i = k
+    return nodes
+
+
+def _split_top(s, seps):
+    """括弧・角括弧の外側にある区切り文字で分割する"""
+    out, depth, cur = [], 0, []
+    for c in s:
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        if depth == 0 and c in seps:
+            out.append("".join(cur))
+            cur = []
+        else:
+            cur.append(c)
+    out.append("".join(cur))
+    return [x.strip() for x in out if x.strip()]
+
+
+def _compound_matches(compound, elements):
+    if ":root" in compound:
+        return True
+    # 疑似クラス・疑似要素・属性セレクタは無視して判定（広めに拾う）
+    simple = re.sub(r"::?[A-Za-z-]+(\([^)]*\))?|\[[^\]]*\]", "", compound)
+    tag, id_, classes = _parse_simple(simple)
+    for et, eid, ecls in elements:
+        if (tag is None or tag == et) and (id_ is None or id_ == eid) and classes <= ecls:
+            return True
+    return False
+
+
+def selector_matches(selector, elements):
+    """
+    セレクタリストのどれかについて、各複合セレクタに一致する要素が領域内にあれば True。
+    祖先関係までは見ないので厳密ではないが、取りこぼすより多めに拾う方に倒している。
+    """
+    for sel in _split_top(selector, ","):
+        compounds = _split_top(sel, " >+~")
+        if compounds and all(_compound_matches(c, elements) for c in compounds):
+            return True
+    return False
+
+
+def _squash(text):
+    """文字列リテラル以外の連続空白を 1 つにする"""
+    parts = re.split(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""", text)
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p) for i, p in enumerate(parts)).strip()
+
+
+def select_critical(nodes, elements):
+    """一致したルールを CSS テキストとして返す（@keyframes は後で参照分だけ足す）"""
+    out = []
+    for node in nodes:
+        if node[0] == "rule":
+            if selector_matches(node[1], elements):
+                out.append("%s{%s}" % (_squash(node[1]), _squash(node[2])))
+        elif node[2] is not None:
+            inner = select_critical(node[2], elements)
+            if inner:
+                out.append("%s{%s}" % (_squash(node[1]), inner))
+        elif node[1].lower().startswith("@import"):
+            out.insert(0, _squash(node[1]) + ";")
+    return "".join(out)
+
+
+def select_deferred(nodes, elements, critical):
+    """
+    インライン化されなかった側（@font-face・未使用の @keyframes を含む）を select_critical と
+    同じ書式で返す。サイズ比較用で、実際には style.css 全体が非同期で読まれる。
+    """
+    out = []
+    for node in nodes:
+        if node[0] == "rule":
+            if not selector_matches(node[1], elements):
+                out.append("%s{%s}" % (_squash(node[1]), _squash(node[2])))
+        elif node[2] is not None:
+            inner = select_deferred(node[2], elements, critical)
+            if inner:
+                out.append("%s{%s}" % (_squash(node[1]), inner))
+        elif node[1].lower().startswith("@import"):
+            continue
+        else:
+            text = "%s{%s}" % (_squash(node[1]), _squash(node[3])) if node[3] else _squash(node[1]) + ";"
+            if text not in critical:
+                out.append(text)
+    return "".join(out)
+
+
+def _keyframes_used(nodes, css_text):
+    out = []
+    for node in nodes:
+        if node[0] == "at" and node[1].lower().startswith(("@keyframes", "@-webkit-keyframes")):
+            name = node[1].split(None, 1)[-1].strip()
+            if re.search(r"\b%s\b" % re.escape(name), css_text):
+                out.append("%s{%s}" % (_squash(node[1]), _squash(node[3])))
+    return "".join(out)
+
+
+def extract(html, css, regions=DEFAULT_REGIONS, with_deferred=False):
+    """
+    インライン化する CSS を返す。with_deferred=True なら (critical, deferred) を返す
+    （deferred は同じ空白詰めで測った残りのルール。サイズの報告用）。
+    """
+    elements = above_fold_elements(html, regions)
+    nodes = parse_css(css)
+    critical = select_critical(nodes, elements)
+    critical += _keyframes_used(nodes, critical)
+    if with_deferred:
+        return critical, select_deferred(nodes, elements, critical)
+    return critical
+
+
+def inline(html, critical, href="./style.css"):
+    """stylesheet の <link> を インライン <style> + 非同期読み込みに置き換える"""
+    pat = re.compile(STYLESHEET_LINK_RE % re.escape(href), re.I)
+    m = pat.search(html)
+    if not m:
+        raise ValueError("index.html に %s の <link> が見つかりません" % href)
+    repl = ("<style id=\"critical-css\">%s</style>\n"
+            "  <link rel=\"preload\" href=\"%s\" as=\"style\" onload=\"this.onload=null;this.rel='stylesheet'\" />\n"
+            "  <noscript><link rel=\"stylesheet\" href=\"%s\" /></noscript>") % (critical.replace("</", "<\\/"), href, href)
+    return html[:m.start()] + repl + html[m.end():]
+
+
+def build(root=None, out=None, regions=DEFAULT_REGIONS):
+    root = root or ROOT
+    with open(os.path.join(root, "index.html"), "r", encoding="utf-8") as f:
+        html = f.read()
+    with open(os.path.join(root, "style.css"), "r", encoding="utf-8-sig") as f:
+        css = f.read()
+    critical, deferred = extract(html, css, regions, with_deferred=True)
+    page = inline(html, critical)
+    if out:
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        # publish でハードリンクされた index.html を書き換えないよう置き換えで書く
+        write_atomic(out, page.encode("utf-8"))
+    # inlined / deferred はどちらも空白を詰めたルールのサイズ。css_bytes（原本）は引き続き全体が読まれる
+    css_bytes = len(css.encode("utf-8"))
+    inlined = len(critical.encode("utf-8"))
+    deferred = len(deferred.encode("utf-8"))
+    return {"css_bytes": css_bytes, "inlined_bytes": inlined, "deferred_bytes": deferred,
+            "html_bytes": len(html.encode("utf-8")), "html_out_bytes": len(page.encode("utf-8"))}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ファーストビュー用 CSS を index.html にインライン化する")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--out", help="書き出す HTML（省略時は報告のみ）")
+    ap.add_argument("--region", action="append", default=None,
+                    help="ファーストビューとみなす領域（tag / #id / .class。既定: %s）" % ", ".join(DEFAULT_REGIONS))
+    args = ap.parse_args(argv)
+
+    r = build(args.root, args.out, tuple(args.region or DEFAULT_REGIONS))
+    rules = r["inlined_bytes"] + r["deferred_bytes"]
+    print("rules (squashed): inlined %d (%.1f%%) / not critical %d" % (
+        r["inlined_bytes"], 100.0 * r["inlined_bytes"] / max(rules, 1), r["deferred_bytes"]))
+    print("style.css: %d bytes, still downloaded in full (async, no longer render-blocking)" % r["css_bytes"])
+    print("index.html: %d -> %d bytes%s" % (r["html_bytes"], r["html_out_bytes"], " -> " + args.out if args.out else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+マスタ CSV を URL（スプレッドシートの CSV 公開 URL など）から取ってくる。
+
+- .hcd_cache/fetch/ に URL ごとの本文と ETag / Last-Modified を保存
+- 2 回目以降は If-None-Match / If-Modified-Since を付け、304 ならキャッシュの本文をそのまま使う
+  （ファイルを書き換えないので mtime が変わらず、normalize 側の差分判定がそのまま効く）
+- ホストごとの keep-alive 接続をプールする。同じホストの URL は PER_HOST 本のレーンに振り分けて
+  レーン内は順に取るので、2 本目以降のテーブルは前の接続をそのまま使う（ホスト同士は並列）
+- リダイレクト（公開シートは googleusercontent へ飛ぶ）は 5 回まで追う
+- 取得に失敗してもキャッシュがあればそれを使う（stale=True）
+"""
+import hashlib, http.client, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+from . import cache_dir, write_atomic
+
+CACHE_SUBDIR = "fetch"
+INDEX_NAME = "index.json"
+MAX_REDIRECTS = 5
+USER_AGENT = "hcd-normalizer/1.0"
+PER_HOST = 2
+
+
+def is_url(s):
+    return isinstance(s, str) and s.startswith(("http://", "https://"))
+
+
+class ConnectionPool:
+    """(scheme, host, port) ごとにアイドル接続を保持する"""
+
+    def __init__(self, timeout=15):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme, host, port):
+        key = (scheme, host, port)
+        with self._lock:
+            conns = self._idle.get(key)
+            if conns:
+                return key, conns.pop()
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return key, cls(host, port, timeout=self.timeout)
+
+    def release(self, key, conn):
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for c in conns:
+                    c.close()
+            self._idle.clear()
+
+
+class FetchCache:
+    """URL → {etag, last_modified, file, sha256, fetched_at}"""
+
+    def __init__(self, root=None):
+        self.dir = os.path.join(cache_dir(root), CACHE_SUBDIR)
+        os.makedirs(self.dir, exist_ok=True)
+        self.index_path = os.path.join(self.dir, INDEX_NAME)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        self._lock = threading.Lock()
+
+    def entry(self, url):
+        e = self.index.get(url)
+        if e and os.path.isfile(os.path.join(self.dir, e["file"])):
+            return e
+        return None
+
+    def body_path(self, url):
+        return os.path.join(self.dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".csv")
+
+    def store(self, url, body, etag, last_modified):
+        path = self.body_path(url)
+        sha = hashlib.sha256(body).hexdigest()
+        prev = self.entry(url)
+        # 200 でも中身が同じなら書き換えない
+        if not (prev and prev.get("sha256") == sha):
+            write_atomic(path, body)
+        with self._lock:
+            self.index[url] = {"file": os.path.basename(path), "sha256": sha, "etag": etag,
+                               "last_modified": last_modified, "fetched_at": int(time.time())}
+        return path, not (prev and prev.get("sha256") == sha)
+
+    def save(self):
+        with self._lock:
+            write_atomic(self.index_path,
+                         json.dumps(self.index, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8"))
+
+
+class FetchResult:
+    """
+    status: 最終レスポンスのステータス（304 / 200、失敗時は 0）
+    changed: キャッシュの本文が書き換わったか（False なら前回と同一内容）
+    """
+    __slots__ = ("url", "path", "status", "changed", "stale", "bytes", "elapsed_ms", "error")
+
+    def __init__(self, url, path, status, changed, stale=False, nbytes=0, elapsed_ms=0.0, error=None):
+        self.url, self.path, self.status, self.changed = url, path, status, changed
+        self.stale, self.bytes, self.elapsed_ms, self.error = stale, nbytes, elapsed_ms, error
+
+    @property
+    def not_modified(self):
+        return not self.changed
+
+
+def _request(pool, url, headers):
+    """リダイレクトを追いながら GET し、(status, response_headers, body) を返す"""
+    for _ in range(MAX_REDIRECTS + 1):
+        u = urlsplit(url)
+        port = u.port or (443 if u.scheme == "https" else 80)
+        path = (u.path or "/") + ("?" + u.query if u.query else "")
+        key, conn = pool.acquire(u.scheme, u.hostname, port)
+        try:
+            try:
+                conn.request("GET", path, headers=headers)
+                res = conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # プール中に切られた keep-alive 接続は 1 回だけ張り直す
+                conn.close()
+                conn.request("GET", path, headers=headers)
+                res = conn.getresponse()
+            body = res.read()
+        except Exception:
+            conn.close()
+            raise
+        if res.getheader("Connection", "").lower() == "close":
+            conn.close()
+        else:
+            pool.release(key, conn)
+        if res.status in (301, 302, 303, 307, 308) and res.getheader("Location"):
+            url = urljoin(url, res.getheader("Location"))
+            continue
+        return res.status, res, body
+    raise http.client.HTTPException("too many redirects: %s" % url)
+
+
+def fetch(url, pool, cache):
+    t0 = time.perf_counter()
+    prev = cache.entry(url)
+    headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "identity"}
+    if prev:
+        if prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+    try:
+        status, res, body = _request(pool, url, headers)
+    except (OSError, http.client.HTTPException) as e:
+        if prev:
+            return FetchResult(url, os.path.join(cache.dir, prev["file"]), 0, False, stale=True,
+                               elapsed_ms=(time.perf_counter() - t0) * 1000, error=str(e))
+        raise
+
+    elapsed = (time.perf_counter() - t0) * 1000
+    if status == 304 and prev:
+        return FetchResult(url, os.path.join(cache.dir, prev["file"]), 304, False, elapsed_ms=elapsed)
+    if status != 200:
+        if prev:
+            return FetchResult(url, os.path.join(cache.dir, prev["file"]), status, False, stale=True,
+                               elapsed_ms=elapsed, error="HTTP %d" % status)
+        raise http.client.HTTPException("HTTP %d: %s" % (status, url))
+    path, changed = cache.store(url, body, res.getheader("ETag"), res.getheader("Last-Modified"))
+    return FetchResult(url, path, 200, changed, nbytes=len(body), elapsed_ms=elapsed)
+
+
+def _lanes(urls, per_host):
+    """{name: url} を (ホストごとに最大 per_host 本の) レーン [[name, ...], ...] に分ける"""
+    by_host = {}
+    for name, url in urls.items():
+        u = urlsplit(url)
+        by_host.setdefault((u.scheme, u.hostname, u.port), []).append(name)
+    lanes = []
+    for names in by_host.values():
+        k = max(1, min(per_host, len(names)))
+        lanes += [names[i::k] for i in range(k)]
+    return lanes
+
+
+def fetch_all(urls, root=None, jobs=None, timeout=15, per_host=PER_HOST):
+    """
+    {name: url} を取得して {name: FetchResult} を返す。
+    ホストごとに per_host 本までの接続で順に取り、接続はプールで使い回す。
+    """
+    cache = FetchCache(root)
+    pool = ConnectionPool(timeout)
+    lanes = _lanes(urls, per_host)
+    results = {}
+
+    def run_lane(names):
+        for n in names:
+            results[n] = fetch(urls[n], pool, cache)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs or min(8, len(lanes)) or 1) as ex:
+            for _ in ex.map(run_lane, lanes):
+                pass
+    finally:
+        pool.close()
+        cache.save()
+    results = {n: results[n] for n in urls}
+    for name, r in results.items():
+        if r.stale:
+            print("WARN: %s: %s の取得に失敗したためキャッシュを使用（%s）" % (name, r.url, r.error), file=sys.stderr)
+    return results
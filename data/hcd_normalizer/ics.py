@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HCD2025_schedule_master.csv から iCalendar を生成する（手書きだった assets/HCD2025.ics を置き換える）。
+
+  python -m hcd_normalizer ics                     # assets/ に書き出す
+  python -m hcd_normalizer ics --out /tmp/cal --date 2025-12-14
+
+  <out>/HCD2025.ics                       開催概要（手書きの予定）＋全セッション（script.js の DEFAULT_ICS_URL）
+  <out>/HCD2025-track-<トラック名>.ics     トラック（会場）ごと
+  <out>/HCD2025-session-<session_id>.ics  セッションごと
+  <out>/HCD2025-calendar.json             トラック名・session_id → ファイル名と、各セッションの DTSTAMP / SEQUENCE
+
+- 開催概要の予定（UID:hcd2025-20251214@alumni。会場・申込・参加費など）は
+  data/HCD2025_calendar_overview.ics に手で書いたものを HCD2025.ics の先頭にそのまま入れる。
+  以前の手書きの HCD2025.ics を登録済みのカレンダーでも同じ予定として残る（DTSTAMP も手で管理）
+- 会場（track）の無い行（休憩・移動）は載せない。LOCATION は「教室（LP の access_address）」で、
+  本編外（S-EX-*、二次会など）は東京校の外なので track だけにする
+- UID は session_id から作るので、マスタの行順や時間が変わってもカレンダー側で同じ予定として更新される
+- DTSTAMP / SEQUENCE はセッションの内容が変わったときだけ進める。状態はコミットされる
+  HCD2025-calendar.json に持つので、別の clone で作り直しても同じ内容になる
+- 各フィードは行をジェネレータで流しながらハッシュを取り、既存ファイルと同じなら書き換えない。
+  ファイルの mtime も内容も変わらないので、カレンダーアプリの再取得は 304 で済む
+- audit は索引に載っているフィードを参照済みとして扱う
+"""
+import argparse, csv, hashlib, json, os, re, sys, time
+
+from . import ROOT, tmp_path
+
+PRODID = "-//Alumni Network//HCD2025//JP"
+TZID = "Asia/Tokyo"
+EVENT_DATE = "2025-12-14"
+UID_FORMAT = "hcd2025-%s@alumni"
+CAL_NAME = "HCD2025"
+OVERVIEW_SRC = os.path.join("data", "HCD2025_calendar_overview.ics")
+LP_TEXT_SRC = os.path.join("data", "HCD2025_LP_text_master.csv")
+VENUE = "グロービス経営大学院 東京校"      # LP テキストマスタに access_address が無いとき
+OFFSITE_PREFIX = "S-EX-"
+DEFAULT_OUT = "assets"
+INDEX_NAME = "%s-calendar.json" % CAL_NAME
+
+VTIMEZONE = ("BEGIN:VTIMEZONE", "TZID:Asia/Tokyo", "X-LIC-LOCATION:Asia/Tokyo", "BEGIN:STANDARD",
+             "TZOFFSETFROM:+0900", "TZOFFSETTO:+0900", "TZNAME:JST", "DTSTART:19700101T000000",
+             "END:STANDARD", "END:VTIMEZONE")
+_UNSAFE_NAME = re.compile(r"[\\/:*?\"<>|#%\s]+")
+_HHMM = re.compile(r"^(\d{1,2}):(\d{2})$")
+
+
+# ---------- 書式 ----------
+def escape_text(s):
+    return (s or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def fold(line):
+    """RFC 5545: 75 オクテットごとに CRLF + 空白で折り返す（UTF-8 の文字途中では切らない）"""
+    if len(line.encode("utf-8")) <= 75:
+        return line + "\r\n"
+    out, cur, size = [], [], 0
+    for ch in line:
+        n = len(ch.encode("utf-8"))
+        if size + n > (75 if not out else 74):
+            out.append("".join(cur))
+            cur, size = [], 0
+        cur.append(ch)
+        size += n
+    out.append("".join(cur))
+    return "\r\n ".join(out) + "\r\n"
+
+
+def _local(date, hhmm):
+    """"13:00" → "20251214T130000"。HH:MM でなければ None"""
+    m = _HHMM.match(hhmm)
+    if not m or int(m.group(1)) > 23 or int(m.group(2)) > 59:
+        return None
+    return "%sT%02d%02d00" % (date.replace("-", ""), int(m.group(1)), int(m.group(2)))
+
+
+def _file_part(s):
+    return _UNSAFE_NAME.sub("_", s).strip("_") or "untitled"
+
+
+# ---------- 手で管理する部分 ----------
+def load_overview(root=None):
+    """開催概要の VEVENT の行（折り返しは戻す）。ファイルが無ければ空"""
+    try:
+        with open(os.path.join(root or ROOT, OVERVIEW_SRC), "r", encoding="utf-8-sig") as f:
+            text = f.read()
+    except OSError:
+        return []
+    return [line for line in re.sub(r"\r?\n[ \t]", "", text).splitlines() if line.strip()]
+
+
+def load_venue(root=None):
+    """LP テキストマスタの access_address（会場名）"""
+    try:
+        with open(os.path.join(root or ROOT, LP_TEXT_SRC), "r", encoding="utf-8-sig", newline="") as f:
+            for r in csv.DictReader(f):
+                if r.get("key") == "access_address" and (r.get("ja_text") or "").strip():
+                    return r["ja_text"].strip()
+    except OSError:
+        pass
+    return VENUE
+
+
+# ---------- セッションとスピーカーの結合 ----------
+class Session:
+    __slots__ = ("id", "uid", "start", "end", "summary", "location", "description", "track", "digest")
+
+    def __init__(self, id_, start, end, summary, location, description, track=""):
+        self.id, self.uid, self.track = id_, UID_FORMAT % id_.lower(), track
+        self.start, self.end = start, end
+        self.summary, self.location, self.description = summary, location, description
+        self.digest = hashlib.sha256("\0".join(
+            (self.uid, start, end, summary, location, description)).encode("utf-8")).hexdigest()
+
+
+def load_sessions(root=None, date=EVENT_DATE):
+    """スケジュールマスタ（textnorm 済み）とスピーカーの結合からセッション一覧を作る"""
+    from .core import TABLES, NormalizeOptions, normalize, read_table
+    from .textnorm import compile_rule, default_normalizer
+    root = root or ROOT
+    spec = TABLES["schedule"]
+    rows, _ = read_table(os.path.join(root, "data", spec.src), spec.must_keys, default_normalizer())
+
+    venue = load_venue(root)
+    name_key = compile_rule(("nfkc", "nospace"))
+    speakers = {}
+    for r in normalize(root, ["speakers"], NormalizeOptions(write=False, image_meta=False))["speakers"].rows:
+        speakers.setdefault(name_key(r["name"]), r)
+
+    sessions = []
+    for r in rows:
+        sid = r.get("session_id", "")
+        start, end = r.get("timetable1", ""), r.get("timetable2", "")
+        track = r.get("track", "")
+        if not sid or not start or not end or not track:
+            # track の無い行は休憩・移動
+            continue
+        dtstart, dtend = _local(date, start), _local(date, end)
+        if dtstart is None or dtend is None:
+            # "TBD" などの未確定の時刻はフィードに載せない（他のセッションは出す）
+            print("WARN: %s: 時刻が HH:MM ではないためスキップ (%s - %s)" % (sid, start, end), file=sys.stderr)
+            continue
+        block = r.get("session_title_filled", "")
+        title = r.get("session_title", "")
+        summary = block if not title or title == block else "%s｜%s" % (block, title) if block else title
+        lines = []
+        if title and title != block:
+            lines.append(title)
+        for k in ("speaker_name_keys1", "speaker_name_keys2"):
+            key = r.get(k, "")
+            if not key:
+                continue
+            sp = speakers.get(key)
+            name = sp["name"] if sp else key
+            aff = " / ".join(x for x in ((sp or {}).get("title", ""), (sp or {}).get("org", "")) if x)
+            lines.append("登壇: %s%s" % (name, "（%s）" % aff if aff else ""))
+        lines += [r[k] for k in ("tag1", "tag2", "note") if r.get(k)]
+        location = track if sid.startswith(OFFSITE_PREFIX) else "%s（%s）" % (track, venue)
+        sessions.append(Session(sid, dtstart, dtend, summary, location, "\n".join(lines), track))
+    return sessions
+
+
+# ---------- フィード ----------
+def feed_lines(name, sessions, stamps, overview=()):
+    """1 フィード分の行を順に返す（stamps: uid → [digest, dtstamp, sequence]。overview は先頭に入れる VEVENT）"""
+    yield fold("BEGIN:VCALENDAR")
+    for line in ("VERSION:2.0", "PRODID:" + PRODID, "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+                 "X-WR-CALNAME:" + escape_text(name), "X-WR-TIMEZONE:" + TZID) + VTIMEZONE:
+        yield fold(line)
+    for line in overview:
+        yield fold(line)
+    for s in sessions:
+        _, dtstamp, seq = stamps[s.uid]
+        yield fold("BEGIN:VEVENT")
+        yield fold("UID:" + s.uid)
+        yield fold("DTSTAMP:" + dtstamp)
+        yield fold("SEQUENCE:%d" % seq)
+        yield fold("DTSTART;TZID=%s:%s" % (TZID, s.start))
+        yield fold("DTEND;TZID=%s:%s" % (TZID, s.end))
+        yield fold("SUMMARY:" + escape_text(s.summary))
+        if s.description:
+            yield fold("DESCRIPTION:" + escape_text(s.description))
+        if s.location:
+            yield fold("LOCATION:" + escape_text(s.location))
+        yield fold("END:VEVENT")
+    yield fold("END:VCALENDAR")
+
+
+def _digest_lines(lines):
+    h = hashlib.sha256()
+    for line in lines:
+        h.update(line.encode("utf-8"))
+    return h.hexdigest()
+
+
+def write_feed(path, lines_factory):
+    """
+    流した行のハッシュが既存ファイルの sha256 と同じなら何もしない。
+    変わっていれば行を流しながら一時ファイルに書いて置き換える。戻り値は (digest, written)。
+    """
+    from .compress import sha256_file
+    digest = _digest_lines(lines_factory())
+    if os.path.isfile(path) and sha256_file(path) == digest:
+        return digest, False
+    tmp = tmp_path(path)
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        for line in lines_factory():
+            f.write(line)
+    os.replace(tmp, path)
+    return digest, True
+
+
+def _load_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_feeds(root=None, out_dir=None, date=EVENT_DATE, now=None):
+    """
+    全体・トラック別・セッション別のフィードと索引を書き出す。
+    戻り値は {feeds, written, removed, sessions}。
+    """
+    root = root or ROOT
+    out_dir = out_dir or os.path.join(root, DEFAULT_OUT)
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    # 消えたセッションの状態も残す（戻ってきたときに SEQUENCE を巻き戻さない）
+    stamps = _load_index(index_path).get("stamps", {})
+
+    sessions = load_sessions(root, date)
+    dtstamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(now))
+    for s in sessions:
+        prev = stamps.get(s.uid)
+        if prev is None:
+            stamps[s.uid] = [s.digest, dtstamp, 0]
+        elif prev[0] != s.digest:
+            stamps[s.uid] = [s.digest, dtstamp, prev[2] + 1]
+
+    feeds = [("%s.ics" % CAL_NAME, CAL_NAME, sessions, load_overview(root))]
+    index = {"all": feeds[0][0], "tracks": {}, "sessions": {}, "stamps": stamps}
+    by_track = {}
+    for s in sessions:
+        by_track.setdefault(s.track, []).append(s)
+    for track, items in by_track.items():
+        fname = "%s-track-%s.ics" % (CAL_NAME, _file_part(track))
+        index["tracks"][track] = fname
+        feeds.append((fname, "%s %s" % (CAL_NAME, track), items, ()))
+    for s in sessions:
+        fname = "%s-session-%s.ics" % (CAL_NAME, _file_part(s.id))
+        index["sessions"][s.id] = fname
+        feeds.append((fname, "%s %s" % (CAL_NAME, s.summary), [s], ()))
+
+    written = []
+    for fname, calname, items, overview in feeds:
+        _, changed = write_feed(os.path.join(out_dir, fname),
+                                lambda c=calname, i=items, o=overview: feed_lines(c, i, stamps, o))
+        if changed:
+            written.append(fname)
+
+    index_data = json.dumps(index, ensure_ascii=False, indent=1, sort_keys=True) + "\n"
+    if write_feed(index_path, lambda: iter([index_data]))[1]:
+        written.append(INDEX_NAME)
+
+    # 前回のトラック別・セッション別で今回不要になったものを消す（assets/ の他のファイルには触れない）
+    keep = {feed[0] for feed in feeds}
+    removed = []
+    with os.scandir(out_dir) as it:
+        for e in it:
+            base = e.name[:-3] if e.name.endswith((".gz", ".br")) else e.name
+            if (e.is_file() and base.startswith(CAL_NAME + "-") and base.endswith(".ics")
+                    and base not in keep):
+                os.remove(e.path)
+                removed.append(e.name)
+    return {"feeds": len(feeds), "written": written, "removed": removed, "sessions": len(sessions)}
+
+
+def feed_names(index_path):
+    """索引に載っているファイル名（索引自身を含む）。索引が無ければ空"""
+    index = _load_index(index_path)
+    if not index:
+        return []
+    names = [INDEX_NAME, index.get("all", "")]
+    names += list(index.get("tracks", {}).values()) + list(index.get("sessions", {}).values())
+    return [n for n in names if n]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="スケジュールマスタから .ics（全体・トラック別・セッション別）を生成する")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--out", default=None, help="出力先（既定: <root>/assets）")
+    ap.add_argument("--date", default=EVENT_DATE, help="開催日 YYYY-MM-DD（既定: %s）" % EVENT_DATE)
+    args = ap.parse_args(argv)
+
+    r = build_feeds(args.root, args.out, args.date)
+    print("%d sessions -> %d feeds + %s (written %d, removed %d)" % (
+        r["sessions"], r["feeds"], INDEX_NAME, len(r["written"]), len(r["removed"])))
+    for name in r["written"]:
+        print("  " + name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+写真の縦横サイズと、カード描画前に出す軽量プレースホルダを作る。
+
+- サイズはファイル先頭のヘッダだけ読んで取る（JPEG は SOF マーカーまで、PNG は IHDR）
+- プレースホルダは Pillow で 16px 程度に縮小してぼかした JPEG の data URI。
+  Pillow が無いときだけ同じ縦横比の単色グレー SVG の data URI（どちらも数百バイト）。
+  標準ライブラリだけでは JPEG をデコードできないので、ぼかしには Pillow（build の依存）が要る
+- 結果は画像の sha256 をキーに .hcd_cache/images.json に保存し、同じ画像は再計算しない
+  （build で複数テーブルが並列に保存するので、ロックを取ってディスク上の内容とマージして書く）
+"""
+import base64, contextlib, io, json, os, struct
+from urllib.parse import quote
+
+from . import cache_dir, write_atomic
+from .compress import sha256_file
+
+IMAGE_FIELDS = ("width", "height", "placeholder")
+CACHE_NAME = "images.json"
+PLACEHOLDER_PX = 16
+FALLBACK_FILL = "#e5e7eb"
+
+
+def image_size(path):
+    """(width, height) を返す。対応外・壊れている場合は None"""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _webp_size(head, f)
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return _jpeg_size(f)
+    return None
+
+
+def _webp_size(head, f):
+    chunk = head[12:16]
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    f.seek(20)
+    data = f.read(10)
+    if chunk == b"VP8 " and data[3:6] == b"\x9d\x01\x2a":
+        w, h = struct.unpack("<HH", data[6:10])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and data[:1] == b"\x2f":
+        bits = int.from_bytes(data[1:5], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def _jpeg_size(f):
+    # SOFn（DHT=C4, JPG=C8, DAC=CC を除く C0〜CF）が見つかるまでセグメントを飛ばす
+    while True:
+        b = f.read(1)
+        while b and b != b"\xff":
+            b = f.read(1)
+        while b == b"\xff":
+            b = f.read(1)
+        if not b:
+            return None
+        marker = b[0]
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+        seg = f.read(2)
+        if len(seg) < 2:
+            return None
+        length = struct.unpack(">H", seg)[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            h, w = struct.unpack(">HH", data[1:5])
+            return w, h
+        f.seek(length - 2, 1)
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """path.lock に排他ロックを取る（fcntl が無い環境ではロックなし）"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_pil():
+    try:
+        from PIL import Image, ImageFilter
+        return Image, ImageFilter
+    except ImportError:
+        return None
+
+
+def have_pil():
+    return _load_pil() is not None
+
+
+def svg_placeholder(width, height, fill=FALLBACK_FILL):
+    svg = "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 %d %d'><rect width='100%%' height='100%%' fill='%s'/></svg>" % (
+        width, height, fill)
+    return "data:image/svg+xml," + quote(svg, safe="/:=' ")
+
+
+def blur_placeholder(path, pil):
+    """Pillow で縮小・ぼかしした JPEG の data URI"""
+    Image, ImageFilter = pil
+    with Image.open(path) as im:
+        # JPEG はデコード時点で 1/8 まで縮小できる
+        im.draft("RGB", (PLACEHOLDER_PX * 4, PLACEHOLDER_PX * 4))
+        im = im.convert("RGB")
+        im.thumbnail((PLACEHOLDER_PX, PLACEHOLDER_PX))
+        im = im.filter(ImageFilter.GaussianBlur(1))
+        buf = io.BytesIO()
+        im.save(buf, "JPEG", quality=40, optimize=True)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+class ImageMetaCache:
+    """
+    sha256 → {width, height, placeholder}。パス → (mtime_ns, size, sha256) も覚えておき、
+    変わっていないファイルはハッシュ計算も省く。
+    """
+
+    def __init__(self, root=None):
+        self.path = os.path.join(cache_dir(root), CACHE_NAME)
+        data = self._load()
+        self.by_hash = data.get("by_hash", {})
+        self.by_path = data.get("by_path", {})
+        self.dirty = False
+        self._pil = None
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _sha(self, path, st):
+        prev = self.by_path.get(path)
+        if prev and prev[0] == st.st_mtime_ns and prev[1] == st.st_size:
+            return prev[2]
+        sha = sha256_file(path)
+        self.by_path[path] = [st.st_mtime_ns, st.st_size, sha]
+        self.dirty = True
+        return sha
+
+    def meta(self, path):
+        """画像のメタ情報 dict。ファイルが無い・読めない場合は空 dict"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return {}
+        try:
+            sha = self._sha(path, st)
+            hit = self.by_hash.get(sha)
+            if self._pil is None:
+                self._pil = _load_pil() or False
+            # Pillow 無しで作った単色 SVG は、Pillow が入ったら作り直す
+            if hit is not None and not (self._pil and hit.get("placeholder", "").startswith("data:image/svg")):
+                return hit
+            size = image_size(path)
+        except (struct.error, ValueError, OSError):
+            # 途中で切れた画像などで normalize 全体を止めない
+            return {}
+        if not size:
+            return {}
+        ph = ""
+        if self._pil:
+            try:
+                ph = blur_placeholder(path, self._pil)
+            except OSError:
+                ph = ""
+        meta = {"width": size[0], "height": size[1], "placeholder": ph or svg_placeholder(*size)}
+        self.by_hash[sha] = meta
+        self.dirty = True
+        return meta
+
+    def save(self):
+        if not self.dirty:
+            return
+        with _locked(self.path):
+            # 他のプロセスがこの間に保存した分を落とさない（同じキーはこちらが新しい）
+            disk = self._load()
+            self.by_hash = dict(disk.get("by_hash", {}), **self.by_hash)
+            self.by_path = dict(disk.get("by_path", {}), **self.by_path)
+            data = {"by_hash": self.by_hash, "by_path": self.by_path}
+            write_atomic(self.path, json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        self.dirty = False
+
+
+def annotate_rows(rows, photo_field, assets_dir, cache):
+    """rows の photo_field（./assets/xxx）を見て width / height / placeholder 列を埋める"""
+    for r in rows:
+        url = r.get(photo_field, "")
+        meta = {}
+        if url.startswith("./assets/"):
+            meta = cache.meta(os.path.join(assets_dir, url[len("./assets/"):]))
+        for k in IMAGE_FIELDS:
+            r[k] = meta.get(k, "")
+    return rows
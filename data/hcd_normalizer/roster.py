@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+申込者・参加者名簿（Peatix などのエクスポート）を、メモリ上限を守りながら取り込む。
+
+- 1 行ずつストリームで読む（ファイル全体は読み込まない）
+- 同一人物は 会員ID または 正規化したメールアドレス のどちらかが一致すれば同じとみなし、
+  申込セッションは和集合にまとめる。1 回目の走査で識別子（64bit ハッシュ）の連結成分を求め、
+  2 回目で成分の最小の識別子を代表キーとしてまとめる
+- 識別子の索引もメモリ上限に数える。上限の半分に収まれば dict の union-find（1 識別子 ~110 bytes）、
+  収まらなければ識別子の組を外部ソートし、最小ラベルを収束するまで伝播させて求める（どちらも同じキー）
+- メモリ上限内なら dict（ハッシュ索引）だけで重複排除、超えたらキー順に並べた塊を一時ファイルへ
+  書き出し、最後に heapq.merge で突き合わせる（外部ソート）。どちらの経路でも出力は初出順
+- 重複排除後の名簿をスケジュールマスタの session_id と突き合わせて申込数を数えたり、
+  登壇者が申し込んでいるかを調べたりできる
+
+  python -m hcd_normalizer roster attendees.csv --out /tmp/roster_dedup.csv --interest
+  python -m hcd_normalizer roster attendees.csv --budget-mb 16 --speakers
+
+名簿は個人情報なので data/ には置かない（publish で公開ディレクトリに入ってしまう）。
+"""
+import argparse, csv, hashlib, heapq, itertools, os, re, sys, tempfile
+from operator import itemgetter
+
+from . import ROOT
+
+ROSTER_FIELDS = ("member_id", "email", "name", "session_ids", "registered_at")
+# 入力ヘッダーの別名（先にあるものを優先）
+ALIASES = {
+    "member_id": ("member_id", "member id", "会員id", "会員番号", "student_id", "学籍番号"),
+    "email": ("email", "e-mail", "mail", "メールアドレス", "メール"),
+    "name": ("name", "name_jp", "氏名", "お名前", "名前"),
+    "session_ids": ("session_ids", "session_id", "sessions", "セッション", "希望セッション"),
+    "registered_at": ("registered_at", "申込日時", "created_at", "timestamp"),
+}
+SESSION_SEP = ";"
+DEFAULT_BUDGET = 64 * 1024 * 1024
+MERGE_FAN_IN = 64
+ROW_OVERHEAD = 400        # dict / str オブジェクトのおおよその固定費（bytes）
+ID_BYTES = 110            # union-find の 1 識別子あたり（dict のエントリと int、拡張時の余裕込み）
+PAIR_BYTES = 140          # 外部ソートのバッファ中の (int, int) 1 組あたり
+
+
+def normalize_email(s):
+    return (s or "").strip().lower()
+
+
+def normalize_member_id(s):
+    return re.sub(r"\s+", "", s or "").upper()
+
+
+def _hid(s):
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def person_ids(row):
+    """行の識別子（会員ID・メールの 64bit ハッシュ）のリスト。空なら重複判定できない行"""
+    ids = []
+    mid = normalize_member_id(row.get("member_id"))
+    if mid:
+        ids.append(_hid("m:" + mid))
+    email = normalize_email(row.get("email"))
+    if email:
+        ids.append(_hid("e:" + email))
+    return ids
+
+
+class Identities:
+    """
+    識別子の union-find。会員ID とメールのどちらかを共有する行は同じ代表に寄せる
+    （A=会員ID のみ、B=メールのみ、C=両方 のような行も C を介して 1 人になる）。
+    """
+    __slots__ = ("parent",)
+
+    def __init__(self):
+        self.parent = {}
+
+    @property
+    def nbytes(self):
+        return len(self.parent) * ID_BYTES
+
+    def _find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def add(self, ids):
+        roots = []
+        for i in ids:
+            if i not in self.parent:
+                self.parent[i] = i
+            roots.append(self._find(i))
+        # 値の小さい方を代表にする（入力順やメモリ上限に依らず同じ結果）
+        root = min(roots)
+        for r in roots:
+            self.parent[r] = root
+
+    def key(self, ids):
+        """代表キー（16 桁の 16 進。文字列順 = 数値順なので run ファイルの並びと一致する）"""
+        return "%016x" % self._find(ids[0])
+
+    def __len__(self):
+        return len(self.parent)
+
+    @classmethod
+    def build(cls, rows, limit=None):
+        """limit（bytes）を超えたら None（呼び出し側は外部ソートに切り替える）"""
+        ident = cls()
+        for row in rows:
+            ids = person_ids(row)
+            if ids:
+                ident.add(ids)
+                if limit is not None and len(ident.parent) * ID_BYTES > limit:
+                    return None
+        return ident
+
+
+# ---------- 識別子の連結成分（外部ソート版） ----------
+def _unique(pairs):
+    prev = None
+    for p in pairs:
+        if p != prev:
+            yield p
+            prev = p
+
+
+def _write_pairs(tmpdir, pairs):
+    with tempfile.NamedTemporaryFile("w", dir=tmpdir, prefix="ids", suffix=".txt", delete=False) as f:
+        f.writelines("%x %x\n" % p for p in pairs)
+    return f.name
+
+
+def _read_pairs(path):
+    with open(path, "r", encoding="ascii") as f:
+        for line in f:
+            a, b = line.split()
+            yield int(a, 16), int(b, 16)
+
+
+class _PairSorter:
+    """(int, int) の組を上限内のバッファで外部ソートし、昇順・重複なしで返す"""
+    __slots__ = ("cap", "tmpdir", "buf", "runs", "peak")
+
+    def __init__(self, budget, tmpdir):
+        self.cap = max(1024, budget // PAIR_BYTES)
+        self.tmpdir = tmpdir
+        self.buf, self.runs, self.peak = [], [], 0
+
+    def add(self, a, b):
+        self.buf.append((a, b))
+        if len(self.buf) >= self.cap:
+            self._spill()
+
+    def _spill(self):
+        self.peak = max(self.peak, len(self.buf) * PAIR_BYTES)
+        self.buf.sort()
+        self.runs.append(_write_pairs(self.tmpdir, _unique(self.buf)))
+        self.buf = []
+
+    def __iter__(self):
+        if not self.runs:
+            self.peak = max(self.peak, len(self.buf) * PAIR_BYTES)
+            self.buf.sort()
+            yield from _unique(self.buf)
+            self.buf = []
+            return
+        if self.buf:
+            self._spill()
+        paths, self.runs = self.runs, []
+        while len(paths) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(paths), MERGE_FAN_IN):
+                group = paths[i:i + MERGE_FAN_IN]
+                merged.append(_write_pairs(self.tmpdir, _unique(heapq.merge(*map(_read_pairs, group)))))
+                for p in group:
+                    os.remove(p)
+            paths = merged
+        try:
+            yield from _unique(heapq.merge(*map(_read_pairs, paths)))
+        finally:
+            for p in paths:
+                # 途中で閉じられたときは一時ディレクトリごと先に消えていることがある
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def to_file(self):
+        return _write_pairs(self.tmpdir, iter(self))
+
+
+def external_keys(open_rows, budget, tmpdir, stats):
+    """
+    union-find が上限に収まらないときの代わり。戻り値は識別子のある行ごとの代表キー（行順のイテレータ）。
+
+    1. 行を 1 回読み、辺（同じ行の 会員ID ⇄ メール）と (先頭の識別子, 行番号) をそれぞれ外部ソート
+    2. ラベル = 自分と隣接の最小値 から始め、隣接の最小ラベルを取り込む走査を変化がなくなるまで繰り返す
+       （走査回数は識別子の鎖の長さに比例する。名簿では 1 人の識別子は 2〜3 個なので数回で収まる）
+    3. (先頭の識別子, 行番号) とラベルを突き合わせ、行番号順に並べ直して返す
+    """
+    edges, firsts = _PairSorter(budget // 2, tmpdir), _PairSorter(budget // 2, tmpdir)
+    for seq, row in enumerate(open_rows()):
+        ids = person_ids(row)
+        if not ids:
+            continue
+        firsts.add(ids[0], seq)
+        if len(ids) == 2 and ids[0] != ids[1]:
+            edges.add(ids[0], ids[1])
+            edges.add(ids[1], ids[0])
+    edges_path = edges.to_file()
+    firsts_path = firsts.to_file()
+    stats.peak_bytes = max(stats.peak_bytes, edges.peak + firsts.peak)
+
+    def initial():
+        for a, group in itertools.groupby(_read_pairs(edges_path), key=itemgetter(0)):
+            yield a, min(a, min(b for _, b in group))
+
+    labels_path = _write_pairs(tmpdir, initial())
+    passes = 1
+    while True:
+        passes += 1
+        cand = _PairSorter(budget, tmpdir)
+        # edges と labels はどちらも同じ節点の昇順
+        for (a, group), (_, label) in zip(itertools.groupby(_read_pairs(edges_path), key=itemgetter(0)),
+                                          _read_pairs(labels_path)):
+            for _, b in group:
+                if label < b:
+                    cand.add(b, label)
+        changed = [0]
+
+        def relabel():
+            it = itertools.groupby(cand, key=itemgetter(0))
+            cur = next(it, None)
+            for node, label in _read_pairs(labels_path):
+                if cur is not None and cur[0] == node:
+                    low = min(x for _, x in cur[1])
+                    cur = next(it, None)
+                    if low < label:
+                        label = low
+                        changed[0] += 1
+                yield node, label
+
+        new_path = _write_pairs(tmpdir, relabel())
+        stats.peak_bytes = max(stats.peak_bytes, cand.peak)
+        os.remove(labels_path)
+        labels_path = new_path
+        if not changed[0]:
+            break
+    os.remove(edges_path)
+
+    out = _PairSorter(budget, tmpdir)
+    labels = _read_pairs(labels_path)
+    cur = next(labels, None)
+    n_ids, prev = 0, None
+    for first, seq in _read_pairs(firsts_path):
+        while cur is not None and cur[0] < first:
+            n_ids += 1
+            cur = next(labels, None)
+        if cur is not None and cur[0] == first:
+            label = cur[1]
+        else:
+            label = first
+            n_ids += first != prev
+        prev = first
+        out.add(seq, label)
+    n_ids += sum(1 for _ in itertools.chain([cur] if cur is not None else [], labels))
+    labels.close()
+    os.remove(labels_path)
+    os.remove(firsts_path)
+    stats.identities, stats.id_passes = n_ids, passes
+    keys = ("%016x" % label for _, label in out)
+    # out の外部ソートはここで済ませておく（以降は run ファイルを順に読むだけ）
+    first_key = next(keys, None)
+    stats.peak_bytes = max(stats.peak_bytes, out.peak)
+    return itertools.chain([first_key] if first_key is not None else [], keys)
+
+
+def _split_sessions(s):
+    return [x for x in re.split(r"[;,、\s]+", s or "") if x]
+
+
+def iter_roster(path):
+    """名簿 CSV / TSV を 1 行ずつ ROSTER_FIELDS の dict にして返す"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        first = f.readline()
+        delim = "\t" if "\t" in first else ","
+        header = next(csv.reader([first], delimiter=delim), [])
+        low = [h.strip().lower() for h in header]
+        index = {}
+        for field, names in ALIASES.items():
+            for n in names:
+                if n in low:
+                    index[field] = low.index(n)
+                    break
+        for rec in csv.reader(f, delimiter=delim):
+            if not any(c.strip() for c in rec):
+                continue
+            row = {k: (rec[i].strip() if i < len(rec) else "") for k, i in index.items()}
+            row["email"] = normalize_email(row.get("email"))
+            row["member_id"] = normalize_member_id(row.get("member_id"))
+            row["session_ids"] = SESSION_SEP.join(_split_sessions(row.get("session_ids")))
+            for k in ROSTER_FIELDS:
+                row.setdefault(k, "")
+            yield row
+
+
+def merge_rows(a, b):
+    """同一人物の 2 行をまとめる。先の行を優先し、空欄だけ後の行で埋め、セッションは和集合"""
+    out = dict(a)
+    for k in ROSTER_FIELDS:
+        if not out.get(k) and b.get(k):
+            out[k] = b[k]
+    sessions = _split_sessions(a.get("session_ids"))
+    for s in _split_sessions(b.get("session_ids")):
+        if s not in sessions:
+            sessions.append(s)
+    out["session_ids"] = SESSION_SEP.join(sessions)
+    return out
+
+
+def _row_bytes(row):
+    return ROW_OVERHEAD + 2 * sum(len(v) for v in row.values())
+
+
+class DedupStats:
+    # peak_bytes は識別子の索引も含めた見積もり。id_passes は外部ソート版のラベル伝播の走査回数（0 = dict）
+    __slots__ = ("rows_in", "rows_out", "no_key", "runs", "peak_bytes", "identities", "id_passes")
+
+    def __init__(self):
+        self.rows_in = self.rows_out = self.no_key = self.runs = self.peak_bytes = 0
+        self.identities = self.id_passes = 0
+
+
+def _write_run(tmpdir, items, n, prefix="run"):
+    """(key, seq, row) を並んでいる順のまま run ファイルに書く"""
+    path = os.path.join(tmpdir, "%s%05d.csv" % (prefix, n))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        for key, seq, row in items:
+            w.writerow([key, seq] + [row[k] for k in ROSTER_FIELDS])
+    return path
+
+
+def _index_items(index):
+    return ((key, seq, row) for key, (seq, row) in sorted(index.items()))
+
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for rec in csv.reader(f):
+            yield rec[0], int(rec[1]), dict(zip(ROSTER_FIELDS, rec[2:]))
+
+
+def _merge_runs(paths, tmpdir):
+    """run ファイルを (key, seq) 順に突き合わせて、同じキーをまとめながら返す"""
+    # ファイルを開きすぎないよう、多いときは段階的にまとめる
+    n = 0
+    while len(paths) > MERGE_FAN_IN:
+        merged = []
+        for i in range(0, len(paths), MERGE_FAN_IN):
+            group = paths[i:i + MERGE_FAN_IN]
+            out = os.path.join(tmpdir, "merge%05d.csv" % n)
+            n += 1
+            with open(out, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                for key, seq, row in _merge_groups(group):
+                    w.writerow([key, seq] + [row[k] for k in ROSTER_FIELDS])
+            for p in group:
+                os.remove(p)
+            merged.append(out)
+        paths = merged
+    return _merge_groups(paths)
+
+
+def _merge_groups(paths):
+    streams = [_read_run(p) for p in paths]
+    merged = heapq.merge(*streams, key=lambda t: (t[0], t[1]))
+    for key, group in itertools.groupby(merged, key=lambda t: t[0]):
+        _, seq, row = next(group)
+        for _, _, other in group:
+            row = merge_rows(row, other)
+        yield key, seq, row
+
+
+def _by_first_seen(groups, budget, tmpdir):
+    """
+    キー順に来る (key, seq, row) を seq（初出）順に並べ直す。
+    上限ごとに seq 順の run を書き、heapq.merge でつなぐ（2 段目の外部ソート）。
+    """
+    runs, buf, used = [], [], 0
+    for _, seq, row in groups:
+        buf.append(("%012d" % seq, seq, row))
+        used += _row_bytes(row)
+        if used > budget:
+            buf.sort(key=lambda t: t[1])
+            runs.append(_write_run(tmpdir, buf, len(runs), "seq"))
+            buf, used = [], 0
+    buf.sort(key=lambda t: t[1])
+    if not runs:
+        for _, _, row in buf:
+            yield row
+        return
+    if buf:
+        runs.append(_write_run(tmpdir, buf, len(runs), "seq"))
+    for _, _, row in heapq.merge(*[_read_run(p) for p in runs], key=lambda t: t[1]):
+        yield row
+
+
+def dedup(open_rows, budget=DEFAULT_BUDGET, tmpdir=None, stats=None):
+    """
+    名簿行を重複排除して返すジェネレータ。open_rows は新しい行イテレータを返す関数
+    （例: lambda: iter_roster(path)）で、識別子の索引づくりと本体で 2 回（索引が上限を超えたら 3 回）呼ぶ。
+    出力は各人物の初出順（上限を超えて一時ファイルに書き出しても同じ順）。キーの無い行はそのまま流す。
+    """
+    stats = stats if stats is not None else DedupStats()
+    work = None
+    try:
+        ident = Identities.build(open_rows(), budget // 2)
+        if ident is not None:
+            # 常駐する union-find の分だけ行の索引に使える量を減らす
+            stats.identities, base, keys = len(ident), ident.nbytes, None
+        else:
+            work = tempfile.TemporaryDirectory(prefix="hcd_roster_", dir=tmpdir)
+            base, keys = 0, external_keys(open_rows, budget, work.name, stats)
+        budget -= base
+        index, used, runs = {}, 0, []
+        for seq, row in enumerate(open_rows()):
+            stats.rows_in += 1
+            ids = person_ids(row)
+            if not ids:
+                stats.no_key += 1
+                stats.rows_out += 1
+                yield row
+                continue
+            key = ident.key(ids) if keys is None else next(keys)
+            hit = index.get(key)
+            if hit is not None:
+                index[key] = (hit[0], merge_rows(hit[1], row))
+                continue
+            index[key] = (seq, row)
+            used += _row_bytes(row)
+            stats.peak_bytes = max(stats.peak_bytes, base + used)
+            if used > budget:
+                if work is None:
+                    work = tempfile.TemporaryDirectory(prefix="hcd_roster_", dir=tmpdir)
+                runs.append(_write_run(work.name, _index_items(index), len(runs)))
+                index, used = {}, 0
+        if not runs:
+            for _, row in sorted(index.values(), key=lambda t: t[0]):
+                stats.rows_out += 1
+                yield row
+            return
+        if index:
+            runs.append(_write_run(work.name, _index_items(index), len(runs)))
+            index = {}
+        stats.runs = len(runs)
+        for row in _by_first_seen(_merge_runs(runs, work.name), budget, work.name):
+            stats.rows_out += 1
+            yield row
+    finally:
+        if work is not None:
+            work.cleanup()
+
+
+# ---------- スケジュール・登壇者との突き合わせ ----------
+def load_sessions(root=None):
+    """スケジュールマスタから {session_id: {title, track, start, end}}"""
+    from .core import read_table
+    root = root or ROOT
+    rows, _ = read_table(os.path.join(root, "data", "HCD2025_schedule_master.csv"),
+                         ("session_id", "timetable1", "timetable2", "session_title", "track"))
+    out = {}
+    for r in rows:
+        sid = (r.get("session_id") or "").strip()
+        if sid and sid != "session_id" and sid not in out:
+            out[sid] = {"title": (r.get("session_title_filled") or r.get("session_title") or "").strip(),
+                        "track": (r.get("track") or "").strip(),
+                        "start": (r.get("timetable1") or "").strip(),
+                        "end": (r.get("timetable2") or "").strip()}
+    return out
+
+
+class SessionCounter:
+    """名簿行を 1 行ずつ受け取り、session_id ごとの申込数を数える"""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.counts = dict.fromkeys(sessions, 0)
+        self.unknown = {}
+
+    def add(self, row):
+        for sid in _split_sessions(row.get("session_ids")):
+            if sid in self.counts:
+                self.counts[sid] += 1
+            else:
+                self.unknown[sid] = self.unknown.get(sid, 0) + 1
+
+    def table(self):
+        """スケジュール順の [session_id, title, track, start, end, count]"""
+        return [[sid, s["title"], s["track"], s["start"], s["end"], self.counts[sid]]
+                for sid, s in self.sessions.items()]
+
+
+def _name_key(s):
+    return re.sub(r"[\s　]+", "", s or "")
+
+
+class SpeakerMatcher:
+    """登壇者マスタの name_jp と名簿の氏名を空白を除いて照合する"""
+
+    def __init__(self, root=None):
+        from .core import read_table
+        spk, _ = read_table(os.path.join(root or ROOT, "data", "HCD2025_speakers_master.csv"), ("order", "name_jp"))
+        self.wanted = {_name_key(r.get("name_jp")): r.get("name_jp") for r in spk if r.get("name_jp")}
+        self.found = set()
+
+    def add(self, row):
+        k = _name_key(row.get("name"))
+        if k in self.wanted:
+            self.found.add(k)
+
+    def result(self):
+        """{name_jp: 申込あり}"""
+        return {name: (k in self.found) for k, name in self.wanted.items()}
+
+
+def session_interest(rows, sessions):
+    """重複排除済みの名簿行から (SessionCounter.table(), 未知の session_id → 件数)"""
+    c = SessionCounter(sessions)
+    for row in rows:
+        c.add(row)
+    return c.table(), c.unknown
+
+
+def registered_speakers(rows, root=None):
+    m = SpeakerMatcher(root)
+    for row in rows:
+        m.add(row)
+    return m.result()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="名簿を重複排除し、セッション・登壇者と突き合わせる")
+    ap.add_argument("roster", help="名簿 CSV / TSV")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--out", help="重複排除した名簿の書き出し先")
+    ap.add_argument("--budget-mb", type=float, default=DEFAULT_BUDGET / 1024 / 1024,
+                    help="重複排除の索引（識別子・行）に使うメモリ上限（MB）")
+    ap.add_argument("--tmpdir", default=None, help="外部ソートの一時ファイル置き場")
+    ap.add_argument("--interest", metavar="CSV", nargs="?", const="-",
+                    help="session_id ごとの申込数（ファイル名省略時は標準出力）")
+    ap.add_argument("--speakers", action="store_true", help="登壇者の申込有無を表示")
+    args = ap.parse_args(argv)
+
+    stats = DedupStats()
+    rows = dedup(lambda: iter_roster(args.roster), int(args.budget_mb * 1024 * 1024), args.tmpdir, stats)
+
+    counter = SessionCounter(load_sessions(args.root)) if args.interest else None
+    matcher = SpeakerMatcher(args.root) if args.speakers else None
+
+    # 1 回の走査で書き出し・集計・照合をまとめて行う
+    out_f = open(args.out, "w", encoding="utf-8", newline="") if args.out else None
+    try:
+        w = csv.DictWriter(out_f, fieldnames=list(ROSTER_FIELDS)) if out_f else None
+        if w:
+            w.writeheader()
+        for row in rows:
+            if w:
+                w.writerow(row)
+            if counter:
+                counter.add(row)
+            if matcher:
+                matcher.add(row)
+    finally:
+        if out_f:
+            out_f.close()
+
+    print("roster: %d rows -> %d (no key %d, identities %d %s, spilled runs %d, peak index ~%.1fMB)" % (
+        stats.rows_in, stats.rows_out, stats.no_key, stats.identities,
+        "in memory" if not stats.id_passes else "external, %d passes" % stats.id_passes, stats.runs,
+        stats.peak_bytes / 1024 / 1024), file=sys.stderr)
+    if counter:
+        dst = sys.stdout if args.interest == "-" else open(args.interest, "w", encoding="utf-8", newline="")
+        try:
+            cw = csv.writer(dst)
+            cw.writerow(["session_id", "title", "track", "start", "end", "count"])
+            cw.writerows(counter.table())
+        finally:
+            if dst is not sys.stdout:
+                dst.close()
+        if counter.unknown:
+            print("unknown session_id: %s" % ", ".join(
+                "%s=%d" % kv for kv in sorted(counter.unknown.items())), file=sys.stderr)
+    if matcher:
+        for name, ok in matcher.result().items():
+            print("speaker %s: %s" % (name, "registered" if ok else "-"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本番ホスティングに近い挙動のローカル静的サーバと、ページ訪問の負荷リプレイ。
+
+  python -m hcd_normalizer serve                 # http://127.0.0.1:8000/
+  python -m hcd_normalizer serve --loadtest -c 8 -n 50 [--warm]
+
+サーバ側:
+- 強い ETag（配信する表現ごとの sha256）と If-None-Match / If-Modified-Since → 304
+- 拡張子ごとの Cache-Control（CACHE_RULES）
+- Accept-Encoding に応じて compress で作った .br / .gz を配信（Vary: Accept-Encoding）
+- 単一区間の Range（206 / 416）、HTTP/1.1 keep-alive
+- 1 リクエスト 1 行のログ（ステータス・バイト数・処理時間・エンコーディング）
+"""
+import argparse, email.utils, http.client, mimetypes, os, posixpath, re, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+from . import ROOT
+from .compress import sha256_file
+
+# 本番（GitHub Pages + CDN）を想定したキャッシュ方針。先にマッチしたものを採用
+CACHE_RULES = [
+    ((".html",), "no-cache"),
+    ((".csv", ".ics", ".json"), "no-cache"),
+    ((".css", ".js"), "public, max-age=600"),
+    ((".jpg", ".jpeg", ".png", ".webp", ".gif", ".svg", ".ico", ".woff", ".woff2"), "public, max-age=86400"),
+]
+DEFAULT_CACHE = "public, max-age=600"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+mimetypes.add_type("text/calendar", ".ics")
+mimetypes.add_type("text/csv", ".csv")
+
+
+def cache_control_for(path):
+    low = path.lower()
+    for exts, value in CACHE_RULES:
+        if low.endswith(exts):
+            return value
+    return DEFAULT_CACHE
+
+
+def accepted_encodings(header):
+    """Accept-Encoding から q>0 のトークン集合を返す"""
+    out = set()
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        m = re.search(r"q=([0-9.]+)", params)
+        if m:
+            try:
+                q = float(m.group(1))
+            except ValueError:
+                q = 0.0
+        if token and q > 0:
+            out.add(token.strip().lower())
+    return out
+
+
+def parse_range(header, size):
+    """'bytes=a-b' を (start, end) に。対象外なら None、満たせなければ False"""
+    m = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header or "")
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):
+        n = int(m.group(2))
+        if n == 0:
+            return False
+        return max(size - n, 0), size - 1
+    start = int(m.group(1))
+    end = int(m.group(2)) if m.group(2) else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+class _ETagCache:
+    """(path, mtime_ns, size) をキーに ETag を覚えておく"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tags = {}
+
+    def get(self, path, st):
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            tag = self._tags.get(key)
+        if tag is None:
+            tag = '"%s"' % sha256_file(path)[:32]
+            with self._lock:
+                self._tags[key] = tag
+        return tag
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "HCDStatic/1.0"
+    root = ROOT
+    etags = _ETagCache()
+    quiet = False
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def _resolve(self):
+        path = posixpath.normpath(unquote(urlsplit(self.path).path))
+        parts = [p for p in path.split("/") if p and p not in (".", "..")]
+        # .git / .hcd_cache などのドットファイル・ディレクトリは公開しない
+        if any(p.startswith(".") for p in parts):
+            return None
+        fs = os.path.join(self.root, *parts)
+        if os.path.isdir(fs):
+            fs = os.path.join(fs, "index.html")
+        return fs
+
+    def _serve(self, head):
+        t0 = time.perf_counter()
+        fs = self._resolve()
+        if fs is None or not os.path.isfile(fs):
+            return self._finish(t0, 404, b"not found\n", {"Content-Type": "text/plain"}, head)
+
+        ctype = mimetypes.guess_type(fs)[0] or "application/octet-stream"
+        if ctype.startswith("text/") or ctype in ("application/javascript", "application/json"):
+            ctype += "; charset=utf-8"
+
+        # 事前圧縮ファイルのネゴシエーション（原本より古いサイドカーは編集後の取り残しなので使わない）
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        st = os.stat(fs)
+        src, encoding = fs, None
+        for name, ext in ENCODINGS:
+            if name not in accepted:
+                continue
+            try:
+                side = os.stat(fs + ext)
+            except OSError:
+                continue
+            if side.st_mtime_ns >= st.st_mtime_ns:
+                src, encoding, st = fs + ext, name, side
+                break
+
+        etag = self.etags.get(src, st)
+        headers = {
+            "Content-Type": ctype,
+            "Cache-Control": cache_control_for(fs),
+            "ETag": etag,
+            "Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+            "Vary": "Accept-Encoding",
+            "Accept-Ranges": "bytes",
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        if self._not_modified(etag, st.st_mtime):
+            return self._finish(t0, 304, b"", headers, head, encoding)
+
+        size = st.st_size
+        rng = parse_range(self.headers.get("Range"), size)
+        if rng is not None and self.headers.get("If-Range") not in (None, etag):
+            rng = None
+        if rng is False:
+            headers["Content-Range"] = "bytes */%d" % size
+            return self._finish(t0, 416, b"", headers, head, encoding)
+
+        with open(src, "rb") as f:
+            if rng:
+                start, end = rng
+                f.seek(start)
+                body = f.read(end - start + 1)
+                headers["Content-Range"] = "bytes %d-%d/%d" % (start, end, size)
+                return self._finish(t0, 206, body, headers, head, encoding)
+            body = f.read()
+        return self._finish(t0, 200, body, headers, head, encoding)
+
+    def _not_modified(self, etag, mtime):
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                return int(mtime) <= email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _finish(self, t0, status, body, headers, head, encoding=None):
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        sent = 0
+        if not head and status != 304:
+            self.wfile.write(body)
+            sent = len(body)
+        if not self.quiet:
+            sys.stderr.write("%s %s %d %dB %.2fms %s\n" % (
+                self.command, self.path, status, sent, (time.perf_counter() - t0) * 1000, encoding or "identity"))
+
+    def log_message(self, fmt, *args):
+        # 既定のアクセスログは _finish の 1 行ログで置き換える
+        pass
+
+
+def make_server(root=None, host="127.0.0.1", port=8000, quiet=False):
+    handler = type("Handler", (SiteHandler,), {"root": root or ROOT, "quiet": quiet, "etags": _ETagCache()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# ---------- load test ----------
+_REF_RE = re.compile(r"""(?:href|src)\s*=\s*["'](\./[^"'#?]+)["']""")
+_JS_REF_RE = re.compile(r"""["'](\./(?:data|assets)/[^"'$`{}]+\.[A-Za-z0-9]+)["']""")
+
+
+def page_visit(root=None):
+    """
+    index.html と script.js が参照するローカル資源に、CSV マスタ・HTML・CSS から読まれる画像
+    （audit.collect_references が集める assets/ 参照のうち画像）を足して 1 訪問分として並べる。
+    .ics とカレンダーの索引はボタンを押したときにしか取られないので含めない
+    """
+    from .audit import collect_references
+    from .core import IMAGE_EXT_RE
+    root = root or ROOT
+    urls = ["/"]
+    with open(os.path.join(root, "index.html"), "r", encoding="utf-8") as f:
+        urls += [u[1:] for u in _REF_RE.findall(f.read())]
+    js = os.path.join(root, "script.js")
+    if os.path.isfile(js):
+        with open(js, "r", encoding="utf-8") as f:
+            urls += [u[1:] for u in _JS_REF_RE.findall(f.read()) if not u.endswith(".ics")]
+    urls += ["/assets/" + quote(name) for name in sorted(collect_references(root)) if IMAGE_EXT_RE.search(name)]
+    seen, out = set(), []
+    for u in urls:
+        if u not in seen and (u == "/" or os.path.isfile(os.path.join(root, unquote(u).lstrip("/")))):
+            seen.add(u)
+            out.append(u)
+    return out
+
+
+def _visit(host, port, urls, warm_tags, encoding):
+    """keep-alive の 1 コネクションで 1 訪問分を取得し、(latency_ms, bytes, status) のリストを返す"""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    rows = []
+    try:
+        for u in urls:
+            headers = {"Accept-Encoding": encoding}
+            if warm_tags and u in warm_tags:
+                headers["If-None-Match"] = warm_tags[u]
+            t0 = time.perf_counter()
+            conn.request("GET", u, headers=headers)
+            res = conn.getresponse()
+            body = res.read()
+            rows.append(((time.perf_counter() - t0) * 1000, len(body), res.status))
+    finally:
+        conn.close()
+    return rows
+
+
+def loadtest(host, port, urls, concurrency=8, visits=50, warm=False, encoding="br, gzip"):
+    warm_tags = None
+    if warm:
+        # 2 回目以降の訪問（ブラウザキャッシュあり）を想定して ETag を先に集める
+        warm_tags = {}
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        for u in urls:
+            conn.request("GET", u, headers={"Accept-Encoding": encoding})
+            res = conn.getresponse()
+            res.read()
+            if res.getheader("ETag"):
+                warm_tags[u] = res.getheader("ETag")
+        conn.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        per_visit = list(ex.map(lambda _: _visit(host, port, urls, warm_tags, encoding), range(visits)))
+    wall = time.perf_counter() - t0
+
+    lat = sorted(r[0] for v in per_visit for r in v)
+    visit_ms = sorted(sum(r[0] for r in v) for v in per_visit)
+    statuses = {}
+    for v in per_visit:
+        for r in v:
+            statuses[r[2]] = statuses.get(r[2], 0) + 1
+
+    def pct(xs, p):
+        return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else 0.0
+
+    return {
+        "visits": visits,
+        "requests": len(lat),
+        "bytes": sum(r[1] for v in per_visit for r in v),
+        "wall_s": wall,
+        "rps": len(lat) / wall if wall else 0.0,
+        "req_p50_ms": pct(lat, 0.50),
+        "req_p95_ms": pct(lat, 0.95),
+        "visit_p50_ms": pct(visit_ms, 0.50),
+        "visit_p95_ms": pct(visit_ms, 0.95),
+        "statuses": statuses,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="本番相当のキャッシュ挙動を持つローカル静的サーバ")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("-q", "--quiet", action="store_true", help="リクエストログを出さない")
+    ap.add_argument("--loadtest", action="store_true", help="ページ訪問を並列リプレイして計測する")
+    ap.add_argument("--url", help="計測対象（省略時は内蔵サーバを起動して計測）")
+    ap.add_argument("-c", "--concurrency", type=int, default=8)
+    ap.add_argument("-n", "--visits", type=int, default=50)
+    ap.add_argument("--warm", action="store_true", help="ETag 付きの再訪問（304 経路）を計測")
+    ap.add_argument("--encoding", default="br, gzip", help="送る Accept-Encoding")
+    args = ap.parse_args(argv)
+
+    if not args.loadtest:
+        srv = make_server(args.root, args.host, args.port, args.quiet)
+        print("serving %s at http://%s:%d/" % (args.root, args.host, srv.server_address[1]))
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            srv.server_close()
+        return 0
+
+    srv = None
+    if args.url:
+        u = urlsplit(args.url)
+        host, port = u.hostname, u.port or 80
+    else:
+        srv = make_server(args.root, args.host, 0, quiet=True)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        host, port = srv.server_address[:2]
+    try:
+        urls = page_visit(args.root)
+        r = loadtest(host, port, urls, args.concurrency, args.visits, args.warm, args.encoding)
+    finally:
+        if srv:
+            srv.shutdown()
+            srv.server_close()
+
+    print("visit: %d resources, %d visits x concurrency %d%s" % (
+        len(urls), r["visits"], args.concurrency, " (warm)" if args.warm else ""))
+    print("requests: %d in %.2fs (%.0f req/s), %d bytes" % (r["requests"], r["wall_s"], r["rps"], r["bytes"]))
+    print("request latency p50 %.2fms / p95 %.2fms" % (r["req_p50_ms"], r["req_p95_ms"]))
+    print("visit latency   p50 %.2fms / p95 %.2fms" % (r["visit_p50_ms"], r["visit_p95_ms"]))
+    print("status:", " ".join("%d=%d" % kv for kv in sorted(r["statuses"].items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+正規化済みの speakers / voices を、カード表示用の要約シャードと長文（経歴・ボイス本文）の
+詳細シャードに分け、ページ単位の JSON として書き出す。
+
+  python -m hcd_normalizer shards                       # dist/data/shards/ に書き出す
+  python -m hcd_normalizer shards --out /tmp/shards --page-size 8
+
+  <out>/manifest.json                 テーブルごとのシャード一覧と id → 詳細シャードの対応
+  <out>/speakers.summary.0.json       [{id, name, title, photo_url, width, height, placeholder}, ...]
+  <out>/speakers.detail.0.json        {id: {org, bio}, ...}
+
+ページ側は manifest と要約シャードを先に取り、モーダルを開いた・セクションが見えた時点で
+manifest の ids から該当する詳細シャードだけを取ればよい。
+各ファイルは内容が変わったときだけ書き換え、manifest には内容ハッシュ（v）を載せるので
+?v= を付けて取れば CDN / ブラウザのキャッシュがそのまま効く。
+"""
+import argparse, csv, hashlib, json, os, sys
+
+from . import ROOT
+
+DEFAULT_OUT = os.path.join("dist", "data", "shards")
+MANIFEST_NAME = "manifest.json"
+DEFAULT_PAGE_SIZE = 20
+
+# テーブル名 → (要約の列, 詳細の列)。正規化後の列名で指定する
+SHARD_TABLES = {
+    "speakers": (("id", "name", "title", "photo_url", "width", "height", "placeholder"),
+                 ("org", "bio")),
+    "voices": (("id", "order", "name", "tagline", "photo_url", "width", "height", "placeholder"),
+               ("hcd_title", "hcd_body", "gkai_title", "gkai_body")),
+}
+
+
+def _read_rows(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def _dump(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def shard_table(name, rows, page_size=DEFAULT_PAGE_SIZE):
+    """
+    1 テーブル分のシャードを作る。
+    戻り値は ([(ファイル名, bytes), ...], manifest のエントリ)。
+    """
+    summary_fields, detail_fields = SHARD_TABLES[name]
+    page_size = max(1, int(page_size))
+    files, summary, detail, ids = [], [], [], {}
+    for start in range(0, len(rows), page_size):
+        page = rows[start:start + page_size]
+        no = start // page_size
+        s_name = "%s.summary.%d.json" % (name, no)
+        d_name = "%s.detail.%d.json" % (name, no)
+        s_rows = []
+        for r in page:
+            rec = {k: r[k] for k in summary_fields if k in r}
+            for k in ("width", "height"):
+                if rec.get(k, "").isdigit():
+                    rec[k] = int(rec[k])
+            s_rows.append(rec)
+        d_rows = {r.get("id", ""): {k: r.get(k, "") for k in detail_fields} for r in page}
+        for sname, obj, index in ((s_name, s_rows, summary), (d_name, d_rows, detail)):
+            data = _dump(obj)
+            files.append((sname, data))
+            index.append({"file": sname, "v": hashlib.sha256(data).hexdigest()[:12], "bytes": len(data)})
+        for r in page:
+            ids.setdefault(r.get("id", ""), d_name)
+    entry = {"count": len(rows), "summary_fields": list(summary_fields), "detail_fields": list(detail_fields),
+             "summary": summary, "detail": detail, "ids": ids}
+    return files, entry
+
+
+def build_shards(root=None, out_dir=None, page_size=DEFAULT_PAGE_SIZE, tables=None):
+    """
+    data/ の正規化済み CSV からシャードと manifest を書き出す。
+    前回のシャードで今回不要になったファイルは消す。戻り値は {written, removed, files, bytes, tables}。
+    """
+    from .core import TABLES, write_if_changed
+    root = root or ROOT
+    out_dir = out_dir or os.path.join(root, DEFAULT_OUT)
+    os.makedirs(out_dir, exist_ok=True)
+    names = list(SHARD_TABLES) if tables is None else list(tables)
+
+    manifest = {"version": 1, "page_size": page_size, "tables": {}}
+    all_files = []
+    for name in names:
+        rows = _read_rows(os.path.join(root, "data", TABLES[name].out))
+        files, entry = shard_table(name, rows, page_size)
+        manifest["tables"][name] = entry
+        all_files += files
+    all_files.append((MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")))
+
+    written = [n for n, data in all_files if write_if_changed(os.path.join(out_dir, n), data)]
+    keep = {n for n, _ in all_files}
+    removed = []
+    with os.scandir(out_dir) as it:
+        for e in it:
+            base = e.name[:-3] if e.name.endswith((".gz", ".br")) else e.name
+            if e.is_file() and base.endswith(".json") and base.split(".", 1)[0] in names and base not in keep:
+                os.remove(e.path)
+                removed.append(e.name)
+    return {"written": written, "removed": removed, "files": len(all_files),
+            "bytes": sum(len(d) for _, d in all_files), "tables": manifest["tables"]}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="speakers / voices を要約シャードと詳細シャードに分割する")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--out", default=None, help="出力先（既定: <root>/dist/data/shards）")
+    ap.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="1 シャードの件数")
+    ap.add_argument("--tables", default=None, help="カンマ区切り（%s）" % ",".join(SHARD_TABLES))
+    args = ap.parse_args(argv)
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()] if args.tables else None
+    r = build_shards(args.root, args.out, args.page_size, tables)
+    for name, t in r["tables"].items():
+        s = sum(x["bytes"] for x in t["summary"])
+        d = sum(x["bytes"] for x in t["detail"])
+        print(" %s: %d rows, %d shards / summary %d bytes, detail %d bytes" % (
+            name, t["count"], len(t["summary"]) + len(t["detail"]), s, d))
+    print("%d files, %d bytes (written %d, removed %d)" % (r["files"], r["bytes"], len(r["written"]), len(r["removed"])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
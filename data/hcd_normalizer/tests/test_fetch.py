@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+fetch の条件付き取得を serve のローカルサーバ相手に確かめる。
+
+  cd data && python -m pytest -q hcd_normalizer/tests
+  cd data && python -m unittest hcd_normalizer.tests.test_fetch
+"""
+import os, shutil, tempfile, threading, unittest
+
+from hcd_normalizer import ROOT
+from hcd_normalizer.core import NormalizeOptions, TABLES, normalize
+from hcd_normalizer.serve import make_server
+
+
+class ConditionalFetchTest(unittest.TestCase):
+    def setUp(self):
+        self.site = tempfile.mkdtemp()
+        self.event = tempfile.mkdtemp()
+        src = TABLES["schedule"].src
+        shutil.copy(os.path.join(ROOT, "data", src), os.path.join(self.site, src))
+        os.makedirs(os.path.join(self.event, "data"))
+        os.makedirs(os.path.join(self.event, "assets"))
+        self.server = make_server(self.site, port=0, quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/%s" % (self.server.server_address[1], src)
+        self.stopped = False
+
+    def tearDown(self):
+        self._stop()
+        shutil.rmtree(self.site, ignore_errors=True)
+        shutil.rmtree(self.event, ignore_errors=True)
+
+    def _stop(self):
+        if not self.stopped:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.stopped = True
+
+    def _run(self):
+        opts = NormalizeOptions(write=False, image_meta=False, sources={"schedule": self.url})
+        return normalize(self.event, ["schedule"], opts)["schedule"]
+
+    def test_200_then_304_then_stale_cache(self):
+        first = self._run()
+        self.assertEqual(first.fetch.status, 200)
+        self.assertTrue(first.fetch.changed)
+        self.assertTrue(first.rows)
+
+        second = self._run()
+        self.assertEqual(second.fetch.status, 304)
+        self.assertTrue(second.fetch.not_modified)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.rows, first.rows)
+
+        self._stop()
+        third = self._run()
+        self.assertTrue(third.fetch.stale)
+        self.assertEqual(third.rows, first.rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
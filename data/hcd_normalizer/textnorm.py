@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+マスタのセル文字列を 1 回で正規化する（全角/半角スペース、ダッシュ、コロン、BOM などの揺れ）。
+
+列ごとに規則の組み合わせを決め、起動時に 1 つの str.translate 表へまとめておく。
+1 セルあたり「NFKC（同じ値はキャッシュ）→ translate 1 回 → 空白の畳み込み」だけで済む。
+
+規則:
+  nfkc     Unicode NFKC（全角英数・記号を半角に、半角カナを全角に）
+  ws       各種スペース（全角・NBSP・タブ等）を半角スペースにし、連続を 1 つに畳む
+  nospace  スペースをすべて除く（名前の結合キーなど）
+  dash     各種ダッシュ・波ダッシュを "-" に（"13:00–13:15" → "13:00-13:15"）
+  colon    全角コロン等を ":" に
+BOM・ゼロ幅文字の除去と前後の strip は常に行う。
+"""
+import re, unicodedata
+from functools import lru_cache
+
+NFKC_CACHE_SIZE = 8192
+
+_ALWAYS = {0xFEFF: None, 0x200B: None, 0x200C: None, 0x200D: None, 0x2060: None}
+_TABLES = {
+    "ws": dict.fromkeys([0x3000, 0x00A0, 0x0009, 0x000B, 0x000C, 0x2002, 0x2003, 0x2004, 0x2005,
+                         0x2006, 0x2007, 0x2008, 0x2009, 0x200A, 0x202F, 0x205F], " "),
+    "nospace": dict.fromkeys([0x0020, 0x3000, 0x00A0, 0x0009, 0x2002, 0x2003, 0x2009, 0x200A, 0x202F], None),
+    # NFKC が先に走るので、全角チルダ U+FF5E は "~" になってから来る（U+007E も対象にする）
+    "dash": dict.fromkeys([0x2010, 0x2011, 0x2012, 0x2013, 0x2014, 0x2015, 0x2212, 0xFE58, 0xFE63, 0xFF0D,
+                           0x301C, 0xFF5E, 0x007E], "-"),
+    "colon": dict.fromkeys([0xFF1A, 0xFE13, 0xFE55, 0x2236], ":"),
+}
+RULE_NAMES = ("nfkc",) + tuple(_TABLES)
+_MULTI_SPACE = re.compile(r" {2,}")
+
+# 入力（マスタ側）の列名 → 規則。ここに無い列は DEFAULT_RULE
+DEFAULT_RULE = ("ws",)
+DEFAULT_COLUMN_RULES = {
+    "session_id": ("nfkc", "nospace"),
+    "order": ("nfkc", "nospace"),
+    "id": ("nfkc", "nospace"),
+    "time_block": ("nfkc", "dash", "colon", "nospace"),
+    "timetable1": ("nfkc", "colon", "nospace"),
+    "timetable2": ("nfkc", "colon", "nospace"),
+    "start": ("nfkc", "colon", "nospace"),
+    "end": ("nfkc", "colon", "nospace"),
+    "track": ("nfkc", "ws"),
+    "location": ("nfkc", "ws"),
+    "affiliation": ("nfkc", "ws"),
+    "tags": ("nfkc", "ws"),
+    "tag1": ("nfkc", "ws"),
+    "tag2": ("nfkc", "ws"),
+    "is_keynote": ("nfkc", "nospace"),
+    "name_jp": ("ws",),
+    "speaker_name_keys1": ("nfkc", "nospace"),
+    "speaker_name_keys2": ("nfkc", "nospace"),
+    "photo_file": ("nfkc", "nospace"),
+    "file_key": ("nfkc", "nospace"),
+    "url": ("nfkc", "nospace"),
+}
+
+
+@lru_cache(maxsize=NFKC_CACHE_SIZE)
+def nfkc(s):
+    """同じ値（トラック名・所属など）が何度も出るのでキャッシュする"""
+    return unicodedata.normalize("NFKC", s)
+
+
+def compile_rule(rule):
+    """規則の組から cell → str の関数を作る"""
+    unknown = [r for r in rule if r not in RULE_NAMES]
+    if unknown:
+        raise ValueError("unknown text rule(s): %s" % ", ".join(unknown))
+    table = dict(_ALWAYS)
+    for r in rule:
+        table.update(_TABLES.get(r, {}))
+    table = str.maketrans(table)
+    use_nfkc = "nfkc" in rule
+    fold = "ws" in rule and "nospace" not in rule
+
+    def apply(s):
+        if not s:
+            return s or ""
+        if use_nfkc and not s.isascii():
+            s = nfkc(s)
+        s = s.translate(table)
+        if fold and "  " in s:
+            s = _MULTI_SPACE.sub(" ", s)
+        return s.strip()
+
+    return apply
+
+
+class TextNormalizer:
+    """列名 → 規則 を受け取り、行（dict）をまとめて正規化する"""
+
+    def __init__(self, column_rules=None, default=DEFAULT_RULE):
+        rules = DEFAULT_COLUMN_RULES if column_rules is None else column_rules
+        self.default = compile_rule(default)
+        # 同じ規則なら別インスタンスでも同じキー（core.read_table のキャッシュに使う）
+        self.key = (tuple(default), tuple(sorted((col, tuple(rule)) for col, rule in rules.items())))
+        self._compiled = {}
+        for col, rule in rules.items():
+            self._compiled[col] = compile_rule(tuple(rule))
+
+    def column(self, name):
+        return self._compiled.get(name, self.default)
+
+    def row(self, rec):
+        return {k: self.column(k)(v) for k, v in rec.items()}
+
+    def rows(self, recs):
+        # 列ごとの関数は 1 回だけ引く
+        out, fns = [], {}
+        for rec in recs:
+            d = {}
+            for k, v in rec.items():
+                fn = fns.get(k)
+                if fn is None:
+                    fn = fns[k] = self.column(k)
+                d[k] = fn(v)
+            out.append(d)
+        return out
+
+
+_DEFAULT = None
+
+
+def default_normalizer():
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = TextNormalizer()
+    return _DEFAULT
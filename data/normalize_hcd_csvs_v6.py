@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# v6: 処理本体は hcd_normalizer.core に移した（import しても副作用なし）。
+#     v5c の列に加え、speakers / voices には写真の width / height / placeholder 列が付く
+#     （--no-image-meta で v5c と同じ列）。voices.csv も出力する。python normalize_hcd_csvs_v6.py --help
+import sys
+from hcd_normalizer.core import main
+
+if __name__ == "__main__":
+    sys.exit(main())